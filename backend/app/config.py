@@ -13,6 +13,80 @@ class Settings(BaseSettings):
     # Пример: '[{"id": 12345, "name": "Admin"}, {"id": -999, "name": "Group"}]'
     DESTINATIONS_JSON: str = '[]'
 
+    # На сколько машин вперед готовить фото, пока идет отправка
+    PIPELINE_PREFETCH: int = 3
+
+    # Пул для ресайза фото: "thread" или "process", и число воркеров
+    IMAGE_EXECUTOR: str = "thread"
+    IMAGE_WORKERS: int = 2
+
+    # Профиль ресайза: "quality" (как раньше), "balanced" или "fast" — см. services/images.py
+    IMAGE_PROFILE: str = "quality"
+
+    # Память под фото: предел размера одного скачиваемого файла и общий бюджет
+    # на одновременно декодируемые картинки (несжатые пиксели в Pillow), МБ. 0 — без бюджета
+    IMAGE_MAX_DOWNLOAD_MB: float = 25.0
+    IMAGE_DECODE_BUDGET_MB: int = 256
+
+    # Адреса внешних API. Подменяются на локальные заглушки в бенчмарках (benchmarks/throughput.py).
+    # Пустой TELEGRAM_API_URL — официальный https://api.telegram.org
+    SK_BASE_URL: str = "https://export.skcarrental.com"
+    TELEGRAM_API_URL: str = ""
+
+    # Общий HTTP-клиент к SK Car Rental (keep-alive, HTTP/2 если установлен h2)
+    HTTP2: bool = True
+    HTTP_MAX_CONNECTIONS: int = 50
+    HTTP_MAX_KEEPALIVE: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0
+
+    # Сколько страниц списка аукциона запрашивать параллельно
+    AUCTION_PAGE_CONCURRENCY: int = 5
+
+    # Кэш превью аукционов и ссылок на фото (TTL в секундах, размер в записях)
+    AUCTION_CACHE_TTL: float = 300.0
+    AUCTION_CACHE_SIZE: int = 32
+    PHOTOS_CACHE_TTL: float = 1800.0
+    PHOTOS_CACHE_SIZE: int = 5000
+
+    # Файл базы истории. В проде — внутри примонтированной папки (см. docker-compose.prod.yml):
+    # в режиме WAL рядом с ним лежат history.db-wal и -shm, они тоже должны переживать контейнер
+    DB_NAME: str = "history.db"
+
+    # Сколько секунд живет токен для потока событий (/api/events). EventSource не умеет
+    # слать заголовки, токен уходит в ?token= и оседает в логах nginx — поэтому не пароль, а короткий
+    STREAM_TOKEN_TTL: int = 60
+
+    # Дисковый кэш готовых JPEG (лежит в volume рядом с history.db). 0 МБ — выключен.
+    # Предел — на всю папку, общую для воркеров (соседи сверяются с ней раз в минуту)
+    IMAGE_CACHE_DIR: str = "image_cache"
+    IMAGE_CACHE_MAX_MB: int = 1024
+
+    # Лимиты Bot API (по документации Телеграма): ~30 запросов/сек на бота,
+    # 1/сек в личный чат, 20/мин в группу или канал. BURST — сколько можно отправить подряд
+    TG_GLOBAL_RATE: float = 30.0
+    TG_PRIVATE_CHAT_RATE: float = 1.0
+    TG_GROUP_RATE_PER_MIN: float = 20.0
+    TG_CHAT_BURST: float = 3.0
+    # Удаления (очистка) — свой бакет на чат, отдельно от отправки; глобальный лимит общий
+    TG_DELETE_RATE: float = 10.0
+
+    # Сколько партий из очереди отправляются одновременно
+    JOB_MAX_CONCURRENT: int = 2
+
+    # Автослежение за аукционами: новые и изменившиеся машины сами уходят в очередь.
+    # Пример: '[{"sche_id": "12345", "destinations": [-100123]}]' — chat id из DESTINATIONS_JSON,
+    # без "destinations" — всем получателям. Пустой список — слежение выключено
+    WATCH_AUCTIONS_JSON: str = '[]'
+    WATCH_INTERVAL: float = 300.0
+    # Слать ли весь аукцион при первом опросе (иначе первый опрос только запоминает список)
+    WATCH_POST_INITIAL: bool = False
+
+    # Общее состояние воркеров (лимиты Телеграма, логи, события).
+    # "local" — в памяти, годится для одного воркера; "sqlite" — файл STATE_DB,
+    # обязателен, если uvicorn запущен с --workers больше 1
+    STATE_BACKEND: str = "local"
+    STATE_DB: str = "state.db"
+
     @property
     def destinations(self) -> List[Dict]:
         """Превращает строку JSON из .env в нормальный список Python"""
@@ -21,6 +95,15 @@ class Settings(BaseSettings):
         except json.JSONDecodeError:
             return []
 
+    @property
+    def watch_auctions(self) -> List[Dict]:
+        """WATCH_AUCTIONS_JSON списком; строка вместо объекта — просто ID аукциона"""
+        try:
+            raw = json.loads(self.WATCH_AUCTIONS_JSON)
+        except json.JSONDecodeError:
+            return []
+        return [{"sche_id": str(a)} if not isinstance(a, dict) else a for a in raw]
+
     model_config = {
         "env_file": ".env",
         "env_file_encoding": "utf-8",
@@ -1,76 +1,573 @@
+import asyncio
+import json
+import time
+
 import aiosqlite
 
-DB_NAME = "history.db"
+from .config import settings
 
-async def init_db():
-    async with aiosqlite.connect(DB_NAME) as db:
+DB_NAME = settings.DB_NAME
+
+# Одно соединение на все приложение: открывается в lifespan, закрывается при остановке
+_db: aiosqlite.Connection | None = None
+_commit_task: asyncio.Task | None = None
+
+# Частые записи (сообщения, file_id) коммитим пачкой не чаще раза в COMMIT_DELAY секунд
+COMMIT_DELAY = 1.0
+
+# Миграции схемы по порядку, номер применённой хранится в PRAGMA user_version.
+# Все запросы идемпотентны: старые базы (user_version = 0) уже содержат часть таблиц
+MIGRATIONS = [
+    [
         # Заменили username на destination_name
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS sent_messages (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                batch_id TEXT,
-                chat_id INTEGER,
-                message_id INTEGER,
-                destination_name TEXT, 
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        await db.commit()
+        """
+        CREATE TABLE IF NOT EXISTS sent_messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            batch_id TEXT,
+            chat_id INTEGER,
+            message_id INTEGER,
+            destination_name TEXT, 
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        # file_id фото в Телеграме по ссылке на исходник — чтобы не загружать повторно
+        """
+        CREATE TABLE IF NOT EXISTS photo_files (
+            url TEXT PRIMARY KEY,
+            file_id TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+    ],
+    [
+        # История, очистка партии и удаление конкретных сообщений
+        "CREATE INDEX IF NOT EXISTS idx_sent_messages_batch ON sent_messages (batch_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_sent_messages_chat ON sent_messages (chat_id, message_id)",
+    ],
+    [
+        # Сводка по партиям для истории: ведется при вставке/удалении сообщений,
+        # чтобы не делать GROUP BY по всей sent_messages
+        """
+        CREATE TABLE IF NOT EXISTS batches (
+            batch_id TEXT PRIMARY KEY,
+            destination_name TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            msg_count INTEGER NOT NULL DEFAULT 0,
+            status TEXT NOT NULL DEFAULT 'done'
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_batches_created ON batches (created_at, batch_id)",
+        """
+        INSERT OR IGNORE INTO batches (batch_id, destination_name, created_at, msg_count, status)
+        SELECT batch_id, MAX(destination_name), MIN(created_at), COUNT(*), 'done'
+        FROM sent_messages
+        GROUP BY batch_id
+        """,
+    ],
+    [
+        # Очередь задач /api/process: переживает рестарт контейнера.
+        # Задача = пара (машина, получатель), отметка ставится сразу после отправки
+        """
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id TEXT PRIMARY KEY,
+            destinations TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            total INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)",
+        """
+        CREATE TABLE IF NOT EXISTS job_tasks (
+            job_id TEXT NOT NULL,
+            car_index INTEGER NOT NULL,
+            dest_index INTEGER NOT NULL,
+            car_id TEXT NOT NULL,
+            caption TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            PRIMARY KEY (job_id, car_index, dest_index)
+        )
+        """,
+    ],
+    [
+        # Слепок аукциона для автослежения: по машине — хэш полей, которые могут поменяться.
+        # Ключ (sche_id, car_id) — весь аукцион читается одним проходом по индексу
+        """
+        CREATE TABLE IF NOT EXISTS auction_snapshots (
+            sche_id TEXT NOT NULL,
+            car_id TEXT NOT NULL,
+            hash TEXT NOT NULL,
+            trvl_dist INTEGER,
+            grade TEXT,
+            car_ytiw TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (sche_id, car_id)
+        ) WITHOUT ROWID
+        """,
+    ],
+    [
+        # Несколько воркеров: за кем числится партия и когда он последний раз отзывался
+        "ALTER TABLE jobs ADD COLUMN worker_id TEXT",
+        "ALTER TABLE jobs ADD COLUMN heartbeat_at REAL",
+    ],
+    [
+        # Аренды разовой работы (опрос аукционов): кто из воркеров ее делает и до какого времени.
+        # В history.db, а не в state.db — иначе при STATE_BACKEND=local каждый воркер считал бы себя единственным
+        "CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)",
+    ],
+]
+
+# Сколько пар (chat_id, message_id) подставлять в один запрос
+_PAIRS_PER_QUERY = 400
+
+
+async def get_db() -> aiosqlite.Connection:
+    """Общее соединение. Если lifespan не запускался (скрипты), открываем на лету."""
+    global _db
+    if _db is None:
+        db = await aiosqlite.connect(DB_NAME)
+        # WAL: чтение не ждет записи; NORMAL достаточно надежен вместе с WAL и заметно быстрее
+        await db.execute("PRAGMA journal_mode=WAL")
+        await db.execute("PRAGMA synchronous=NORMAL")
+        await db.execute("PRAGMA busy_timeout=5000")
+        _db = db
+    return _db
+
+
+async def _migrate(db: aiosqlite.Connection):
+    # Воркеров может быть несколько: миграции прогоняет тот, кто первым взял блокировку записи,
+    # остальные ждут и видят уже новую user_version
+    await db.execute("BEGIN IMMEDIATE")
+    try:
+        cursor = await db.execute("PRAGMA user_version")
+        (version,) = await cursor.fetchone()
+        for number, statements in enumerate(MIGRATIONS[version:], version + 1):
+            for sql in statements:
+                await db.execute(sql)
+            await db.execute(f"PRAGMA user_version = {number}")
+    except BaseException:
+        await db.rollback()
+        raise
+    await db.commit()
+
+
+async def init_db():
+    db = await get_db()
+    await _migrate(db)
+
+
+async def flush_db():
+    """Коммитит отложенные записи прямо сейчас."""
+    global _commit_task
+    if _commit_task is not None and not _commit_task.done():
+        _commit_task.cancel()
+    _commit_task = None
+    if _db is not None:
+        await _db.commit()
+
+
+async def close_db():
+    global _db
+    if _db is not None:
+        await flush_db()
+        await _db.close()
+        _db = None
+
+
+async def _delayed_commit():
+    await asyncio.sleep(COMMIT_DELAY)
+    if _db is not None:
+        await _db.commit()
+
+
+def _schedule_commit():
+    """Отложенный коммит: все записи за COMMIT_DELAY уходят одной транзакцией."""
+    global _commit_task
+    if _commit_task is None or _commit_task.done():
+        _commit_task = asyncio.create_task(_delayed_commit())
 
 # Принимаем destination_name вместо username
 async def save_message_ids(batch_id: str, chat_id: int, message_ids: list[int], destination_name: str):
-    async with aiosqlite.connect(DB_NAME) as db:
-        data = [(batch_id, chat_id, mid, destination_name) for mid in message_ids]
-        await db.executemany(
-            "INSERT INTO sent_messages (batch_id, chat_id, message_id, destination_name) VALUES (?, ?, ?, ?)",
-            data
-        )
-        await db.commit()
+    db = await get_db()
+    data = [(batch_id, chat_id, mid, destination_name) for mid in message_ids]
+    await db.executemany(
+        "INSERT INTO sent_messages (batch_id, chat_id, message_id, destination_name) VALUES (?, ?, ?, ?)",
+        data
+    )
+    # Счетчик партии + имя канала (при рассылке в несколько каналов — через запятую)
+    await db.execute(
+        """
+        INSERT INTO batches (batch_id, destination_name, msg_count) VALUES (?, ?, ?)
+        ON CONFLICT(batch_id) DO UPDATE SET
+            msg_count = msg_count + excluded.msg_count,
+            destination_name = CASE
+                WHEN destination_name IS NULL OR destination_name = '' THEN excluded.destination_name
+                WHEN instr(', ' || destination_name || ', ', ', ' || excluded.destination_name || ', ') > 0
+                    THEN destination_name
+                ELSE destination_name || ', ' || excluded.destination_name
+            END
+        """,
+        (batch_id, destination_name, len(message_ids))
+    )
+    _schedule_commit()
+
+async def start_batch(batch_id: str, destination_names: list[str]):
+    """Партия появляется в истории со статусом running еще до первой отправки."""
+    db = await get_db()
+    await db.execute(
+        """
+        INSERT INTO batches (batch_id, destination_name, status) VALUES (?, ?, 'running')
+        ON CONFLICT(batch_id) DO UPDATE SET status = 'running'
+        """,
+        (batch_id, ", ".join(destination_names))
+    )
+    await db.commit()
+
+async def finish_batch(batch_id: str, status: str = "done"):
+    """Закрывает партию. Если ничего не отправилось — убираем ее из истории."""
+    db = await get_db()
+    await db.execute("UPDATE batches SET status = ? WHERE batch_id = ?", (status, batch_id))
+    await db.execute("DELETE FROM batches WHERE batch_id = ? AND msg_count <= 0", (batch_id,))
+    await db.commit()
+
+async def get_file_ids(urls: list[str]) -> dict[str, str]:
+    """Возвращает {url: file_id} для тех фото, что уже загружались в Телеграм."""
+    if not urls:
+        return {}
+    db = await get_db()
+    placeholders = ",".join("?" for _ in urls)
+    cursor = await db.execute(
+        f"SELECT url, file_id FROM photo_files WHERE url IN ({placeholders})",
+        urls
+    )
+    return {url: file_id for url, file_id in await cursor.fetchall()}
+
+async def save_file_ids(pairs: list[tuple[str, str]]):
+    db = await get_db()
+    await db.executemany(
+        "INSERT OR REPLACE INTO photo_files (url, file_id) VALUES (?, ?)",
+        pairs
+    )
+    _schedule_commit()
+
+async def delete_file_ids(urls: list[str]):
+    db = await get_db()
+    await db.executemany("DELETE FROM photo_files WHERE url = ?", [(url,) for url in urls])
+    _schedule_commit()
 
 async def get_messages_by_batch(batch_id: str):
-    async with aiosqlite.connect(DB_NAME) as db:
+    db = await get_db()
+    cursor = await db.execute(
+        "SELECT chat_id, message_id FROM sent_messages WHERE batch_id = ?",
+        (batch_id,)
+    )
+    return await cursor.fetchall()
+
+async def get_all_messages():
+    db = await get_db()
+    cursor = await db.execute("SELECT chat_id, message_id FROM sent_messages")
+    return await cursor.fetchall()
+
+async def delete_message_records(messages: list[tuple[int, int]]):
+    """Удаляет из истории конкретные сообщения (chat_id, message_id)."""
+    db = await get_db()
+    # Сначала считаем, сколько уходит из каждой партии, чтобы поправить сводку
+    removed_per_batch: dict[str, int] = {}
+    for start in range(0, len(messages), _PAIRS_PER_QUERY):
+        chunk = messages[start:start + _PAIRS_PER_QUERY]
+        values = ",".join("(?, ?)" for _ in chunk)
+        params = [value for pair in chunk for value in pair]
         cursor = await db.execute(
-            "SELECT chat_id, message_id FROM sent_messages WHERE batch_id = ?",
-            (batch_id,)
+            f"""
+            SELECT batch_id, COUNT(*) FROM sent_messages
+            WHERE (chat_id, message_id) IN (VALUES {values})
+            GROUP BY batch_id
+            """,
+            params
         )
-        return await cursor.fetchall()
+        for batch_id, count in await cursor.fetchall():
+            removed_per_batch[batch_id] = removed_per_batch.get(batch_id, 0) + count
 
-async def get_all_messages():
-    async with aiosqlite.connect(DB_NAME) as db:
-        cursor = await db.execute("SELECT chat_id, message_id FROM sent_messages")
-        return await cursor.fetchall()
-
-async def delete_batch_record(batch_id: str):
-    async with aiosqlite.connect(DB_NAME) as db:
-        await db.execute("DELETE FROM sent_messages WHERE batch_id = ?", (batch_id,))
-        await db.commit()
-
-async def clear_database():
-    async with aiosqlite.connect(DB_NAME) as db:
-        await db.execute("DELETE FROM sent_messages")
-        await db.commit()
-
-async def get_all_batches():
-    """Возвращает список партий + НАЗВАНИЕ КАНАЛА"""
-    async with aiosqlite.connect(DB_NAME) as db:
-        # Группируем и берем destination_name
-        sql = """
-            SELECT batch_id, created_at, MAX(destination_name) as destination_name, COUNT(message_id) as msg_count 
-            FROM sent_messages 
-            GROUP BY batch_id 
-            ORDER BY created_at DESC
-            LIMIT 50
+    await db.executemany(
+        "DELETE FROM sent_messages WHERE chat_id = ? AND message_id = ?",
+        messages
+    )
+    await db.executemany(
+        "UPDATE batches SET msg_count = msg_count - ? WHERE batch_id = ?",
+        [(count, batch_id) for batch_id, count in removed_per_batch.items()]
+    )
+    await db.executemany(
+        "DELETE FROM batches WHERE batch_id = ? AND msg_count <= 0 AND status != 'running'",
+        [(batch_id,) for batch_id in removed_per_batch]
+    )
+    await db.commit()
+
+async def get_all_batches(limit: int = 50, cursor: str | None = None) -> tuple[list[dict], str | None]:
+    """
+    Возвращает страницу партий + НАЗВАНИЕ КАНАЛА, новые сверху.
+    Пагинация по ключу: cursor = "created_at|batch_id" последней партии прошлой страницы.
+    Вторым значением — курсор следующей страницы (или None).
+    """
+    db = await get_db()
+    params: list = []
+    where = ""
+    if cursor:
+        created_at, _, batch_id = cursor.partition("|")
+        where = "WHERE (created_at, batch_id) < (?, ?)"
+        params += [created_at, batch_id]
+    sql = f"""
+        SELECT batch_id, created_at, destination_name, msg_count, status
+        FROM batches
+        {where}
+        ORDER BY created_at DESC, batch_id DESC
+        LIMIT ?
+    """
+    rows = await (await db.execute(sql, params + [limit])).fetchall()
+    
+    items = [
+        {
+            "batch_id": batch_id,
+            "created_at": created_at,
+            "destination_name": destination_name or "Unknown Chat",
+            "count": msg_count,
+            "status": status
+        }
+        for batch_id, created_at, destination_name, msg_count, status in rows
+    ]
+    next_cursor = None
+    if len(rows) == limit:
+        next_cursor = f"{rows[-1][1]}|{rows[-1][0]}"
+    return items, next_cursor
+
+
+# --- ОЧЕРЕДЬ ЗАДАЧ ---
+
+async def create_job(job_id: str, destinations_json: str, items: list[tuple[str, str]], dest_count: int) -> bool:
+    """Создает задачу и строки по каждой паре (машина, получатель). False — такой job_id уже есть."""
+    db = await get_db()
+    cursor = await db.execute(
+        "INSERT OR IGNORE INTO jobs (job_id, destinations, total) VALUES (?, ?, ?)",
+        (job_id, destinations_json, len(items) * dest_count)
+    )
+    if cursor.rowcount == 0:
+        return False
+    await db.executemany(
+        "INSERT INTO job_tasks (job_id, car_index, dest_index, car_id, caption) VALUES (?, ?, ?, ?, ?)",
+        [
+            (job_id, car_index, dest_index, car_id, caption)
+            for car_index, (car_id, caption) in enumerate(items, 1)
+            for dest_index in range(dest_count)
+        ]
+    )
+    await db.commit()
+    return True
+
+async def get_job(job_id: str) -> dict | None:
+    db = await get_db()
+    cursor = await db.execute(
+        "SELECT job_id, destinations, status, total, created_at, updated_at FROM jobs WHERE job_id = ?",
+        (job_id,)
+    )
+    row = await cursor.fetchone()
+    if row is None:
+        return None
+    return _job_row(row, await _job_counts(db, [job_id]))
+
+async def list_jobs(limit: int = 50) -> list[dict]:
+    db = await get_db()
+    cursor = await db.execute(
+        """
+        SELECT job_id, destinations, status, total, created_at, updated_at
+        FROM jobs ORDER BY created_at DESC LIMIT ?
+        """,
+        (limit,)
+    )
+    rows = await cursor.fetchall()
+    counts = await _job_counts(db, [row[0] for row in rows])
+    return [_job_row(row, counts) for row in rows]
+
+async def _job_counts(db: aiosqlite.Connection, job_ids: list[str]) -> dict:
+    if not job_ids:
+        return {}
+    placeholders = ",".join("?" for _ in job_ids)
+    cursor = await db.execute(
+        f"""
+        SELECT job_id, status, COUNT(*) FROM job_tasks
+        WHERE job_id IN ({placeholders})
+        GROUP BY job_id, status
+        """,
+        job_ids
+    )
+    counts: dict[str, dict[str, int]] = {}
+    for job_id, status, count in await cursor.fetchall():
+        counts.setdefault(job_id, {})[status] = count
+    return counts
+
+def _job_row(row, counts: dict) -> dict:
+    job_id, destinations, status, total, created_at, updated_at = row
+    by_status = counts.get(job_id, {})
+    done = by_status.get("done", 0)
+    return {
+        "job_id": job_id,
+        "status": status,
+        "destinations": json.loads(destinations),
+        "total": total,
+        "done": done,
+        "failed": by_status.get("failed", 0),
+        "pending": by_status.get("pending", 0),
+        "progress": round(done / total, 3) if total else 0.0,
+        "created_at": created_at,
+        "updated_at": updated_at
+    }
+
+async def get_job_tasks(job_id: str) -> list[tuple]:
+    """(car_index, dest_index, car_id, caption, status) по порядку."""
+    db = await get_db()
+    cursor = await db.execute(
+        """
+        SELECT car_index, dest_index, car_id, caption, status FROM job_tasks
+        WHERE job_id = ? ORDER BY car_index, dest_index
+        """,
+        (job_id,)
+    )
+    return await cursor.fetchall()
+
+async def mark_job_task(job_id: str, car_index: int, dest_index: int, status: str):
+    """
+    Чекпоинт после отправки. Коммитим сразу (вместе с id сообщений),
+    иначе после падения машина уйдет в чат второй раз.
+    """
+    db = await get_db()
+    await db.execute(
+        "UPDATE job_tasks SET status = ? WHERE job_id = ? AND car_index = ? AND dest_index = ?",
+        (status, job_id, car_index, dest_index)
+    )
+    await db.commit()
+
+async def set_job_status(job_id: str, status: str, only_if: tuple[str, ...] = ()) -> bool:
+    """Меняет статус задачи. only_if — разрешенные текущие статусы."""
+    db = await get_db()
+    sql = "UPDATE jobs SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE job_id = ?"
+    params: list = [status, job_id]
+    if only_if:
+        sql += f" AND status IN ({','.join('?' for _ in only_if)})"
+        params += list(only_if)
+    cursor = await db.execute(sql, params)
+    await db.commit()
+    return cursor.rowcount > 0
+
+async def get_queued_jobs(limit: int) -> list[str]:
+    db = await get_db()
+    cursor = await db.execute(
+        "SELECT job_id FROM jobs WHERE status = 'queued' ORDER BY created_at, job_id LIMIT ?",
+        (limit,)
+    )
+    return [row[0] for row in await cursor.fetchall()]
+
+async def count_jobs(status: str) -> int:
+    db = await get_db()
+    cursor = await db.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (status,))
+    (count,) = await cursor.fetchone()
+    return count
+
+async def claim_job(job_id: str, worker_id: str) -> bool:
+    """queued -> running за этим воркером. Запись в SQLite одна за раз — партию получит только один."""
+    db = await get_db()
+    cursor = await db.execute(
+        """
+        UPDATE jobs SET status = 'running', worker_id = ?, heartbeat_at = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE job_id = ? AND status = 'queued'
+        """,
+        (worker_id, time.time(), job_id)
+    )
+    await db.commit()
+    return cursor.rowcount > 0
+
+async def heartbeat_jobs(worker_id: str, job_ids: list[str]) -> set[str]:
+    """Продлевает партии воркера. Возвращает те, что все еще running за ним (остальные отменили или забрали)."""
+    if not job_ids:
+        return set()
+    db = await get_db()
+    placeholders = ",".join("?" for _ in job_ids)
+    cursor = await db.execute(
+        f"""
+        UPDATE jobs SET heartbeat_at = ?
+        WHERE worker_id = ? AND status = 'running' AND job_id IN ({placeholders})
+        RETURNING job_id
+        """,
+        (time.time(), worker_id, *job_ids)
+    )
+    owned = {row[0] for row in await cursor.fetchall()}
+    await db.commit()
+    return owned
+
+async def requeue_interrupted_jobs(stale_before: float | None = None, worker_id: str | None = None) -> int:
+    """
+    Партии, что были в работе, снова ставим в очередь.
+    stale_before — только те, чей воркер молчит с этого момента; worker_id — только партии этого воркера.
+    """
+    db = await get_db()
+    sql = "UPDATE jobs SET status = 'queued', worker_id = NULL, updated_at = CURRENT_TIMESTAMP WHERE status = 'running'"
+    params: list = []
+    if stale_before is not None:
+        sql += " AND (heartbeat_at IS NULL OR heartbeat_at < ?)"
+        params.append(stale_before)
+    if worker_id is not None:
+        sql += " AND worker_id = ?"
+        params.append(worker_id)
+    cursor = await db.execute(sql, params)
+    await db.commit()
+    return cursor.rowcount
+
+# --- АРЕНДЫ (разовая работа одного воркера) ---
+
+async def try_acquire_lease(name: str, owner: str, ttl: float) -> bool:
+    """Берет или продлевает аренду на ttl секунд. Чужая еще не истекла — False."""
+    db = await get_db()
+    now = time.time()
+    cursor = await db.execute(
+        """
+        INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?)
+        ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+        WHERE leases.expires_at < ? OR leases.owner = excluded.owner
+        """,
+        (name, owner, now + ttl, now)
+    )
+    await db.commit()
+    return cursor.rowcount > 0
+
+async def release_lease(name: str, owner: str):
+    db = await get_db()
+    await db.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner))
+    await db.commit()
+
+# --- СЛЕПКИ АУКЦИОНОВ (автослежение) ---
+
+async def get_auction_snapshot(sche_id: str) -> dict[str, str]:
+    """{car_id: hash} последнего опроса аукциона."""
+    db = await get_db()
+    cursor = await db.execute("SELECT car_id, hash FROM auction_snapshots WHERE sche_id = ?", (sche_id,))
+    return dict(await cursor.fetchall())
+
+async def save_auction_snapshot(sche_id: str, rows: list[tuple], removed: list[str]):
+    """
+    rows — новые и изменившиеся машины (car_id, hash, trvl_dist, grade, car_ytiw),
+    removed — пропавшие с аукциона. Коммитим сразу: иначе после рестарта машины уйдут повторно.
+    """
+    db = await get_db()
+    await db.executemany(
         """
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute(sql)
-        rows = await cursor.fetchall()
-        
-        return [
-            {
-                "batch_id": row["batch_id"],
-                "created_at": row["created_at"],
-                "destination_name": row["destination_name"] or "Unknown Chat",
-                "count": row["msg_count"]
-            }
-            for row in rows
-        ]
\ No newline at end of file
+        INSERT INTO auction_snapshots (sche_id, car_id, hash, trvl_dist, grade, car_ytiw)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (sche_id, car_id) DO UPDATE SET
+            hash = excluded.hash, trvl_dist = excluded.trvl_dist, grade = excluded.grade,
+            car_ytiw = excluded.car_ytiw, updated_at = CURRENT_TIMESTAMP
+        """,
+        [(sche_id, *row) for row in rows]
+    )
+    await db.executemany(
+        "DELETE FROM auction_snapshots WHERE sche_id = ? AND car_id = ?",
+        [(sche_id, car_id) for car_id in removed]
+    )
+    await db.commit()
@@ -1,15 +1,64 @@
+import asyncio
+import importlib
+
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 from app.routers import api
-from app.database import init_db  # <--- Импорт функции
+from app.database import init_db, close_db, count_jobs  # <--- Импорт функции
+from app.services.images import shutdown_image_executor
+from app.services.http import init_http_client, close_http_client
+from app.services.telegram import init_bot, close_bot
+from app.services.logger import logger
+from app.services.jobs import job_queue
+from app.services.watcher import watcher
+from app.services import metrics
+from app.services.events import events
+from app.services.state import state
+from app.services.parser import auction_cache, photos_cache
+from app.services.image_cache import image_cache
+from app.services.processing import active_pipeline_queues
+
+async def warm_up():
+    """
+    aiogram и Pillow импортируются лениво — иначе каждый рестарт и перезагрузка uvicorn
+    ждали бы их секунды. Здесь они грузятся в фоне уже после старта, и общий бот
+    создается заранее: сервер отвечает сразу, а первая партия не платит за импорт.
+    """
+    try:
+        # Импорт в потоке, чтобы event loop успевал отвечать на запросы
+        await asyncio.to_thread(importlib.import_module, "PIL.Image")
+        await asyncio.to_thread(importlib.import_module, "aiogram")
+        await init_bot()
+    except Exception as e:
+        # Например, не задан BOT_TOKEN — ошибка всплывет при первой отправке, как и раньше
+        logger.warning("Warm-up failed: %s", e)
 
 # <--- ВОТ ЭТОЙ ЧАСТИ СКОРЕЕ ВСЕГО НЕ ХВАТАЕТ ИЛИ ОНА НЕ ПОДКЛЮЧЕНА
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Этот код выполняется при старте сервера
     await init_db()
+    # Общее состояние воркеров (лимиты, логи, события); при одном воркере — просто память
+    await state.start()
+    await init_http_client()
+    warm_up_task = asyncio.create_task(warm_up())
+    # Очередь партий: подхватывает недоделанное после рестарта
+    await job_queue.start()
+    # Автослежение за аукционами (если они заданы в WATCH_AUCTIONS_JSON)
+    await watcher.start()
     yield
+    warm_up_task.cancel()
+    await watcher.stop()
+    await job_queue.stop()
+    await close_bot()
+    # При остановке закрываем соединения и гасим пул ресайза фото
+    await close_http_client()
+    shutdown_image_executor()
+    await state.stop()
+    # Дописываем отложенные записи и закрываем соединение с базой
+    await close_db()
 
 # Обрати внимание на параметр lifespan
 app = FastAPI(title="SK Car Parser MVP", lifespan=lifespan)
@@ -26,4 +75,20 @@ app.add_middleware(
 async def health_check():
     return {"status": "ok", "message": "SK Parser Backend is running!"}
 
+# Значения, которые и так где-то хранятся, метрики читают только в момент запроса
+metrics.ACTIVE_BATCHES.set_function(job_queue.active_jobs)
+metrics.SSE_SUBSCRIBERS.set_function(lambda: events.subscribers)
+metrics.PIPELINE_DEPTH.set_function(lambda: sum(q.qsize() for q in active_pipeline_queues))
+metrics.CACHE_REQUESTS.set_function(lambda: {
+    key: value
+    for cache in (auction_cache, photos_cache, image_cache)
+    for key, value in (((cache.name, "hit"), cache.hits), ((cache.name, "miss"), cache.misses))
+})
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Метрики в текстовом формате Prometheus. Наружу не проксируется (nginx отдает только /api)."""
+    metrics.QUEUED_JOBS.set(await count_jobs("queued"))
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
 app.include_router(api.router)
\ No newline at end of file
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, TypeAdapter
+from typing import List, Literal, Optional
 
 class CarItem(BaseModel):
     uscrId: str
@@ -13,13 +13,66 @@ class CarItem(BaseModel):
     trvlDist: int
     grade: str
 
+# Весь список авто валидируется и сериализуется одним вызовом pydantic-core, а не по штуке
+car_list_adapter = TypeAdapter(List[CarItem])
+
+class AuctionList(list):
+    """
+    Список авто аукциона. complete=False — часть страниц не пришла или строк меньше, чем total:
+    такой список годится для превью, но не для сравнения со слепком и не для кэша.
+    """
+    def __init__(self, items=(), complete: bool = True):
+        super().__init__(items)
+        self.complete = complete
+
+class AuctionQuery(BaseModel):
+    """Фильтры, сортировка и страница превью аукциона. Пустой запрос — весь список, как раньше."""
+    q: Optional[str] = None  # Подстрока в лоте, названии, номере или VIN
+    min_mileage: Optional[int] = None
+    max_mileage: Optional[int] = None
+    min_year: Optional[int] = None
+    max_year: Optional[int] = None
+    years: List[int] = []
+    grades: List[str] = []
+    lot_from: Optional[int] = None
+    lot_to: Optional[int] = None
+    sort: Optional[Literal["lot", "year", "mileage", "name"]] = None
+    desc: bool = False
+    offset: int = 0
+    limit: Optional[int] = None
+
+    def is_empty(self) -> bool:
+        return self == AuctionQuery()
+
 class CarRequestItem(BaseModel):
     id: str
     caption: str
 
+class Destination(BaseModel):
+    chat_id: int
+    message_thread_id: Optional[int] = None
+    name: str
+
 class ProcessRequest(BaseModel):
     items: List[CarRequestItem]
-    target_chat_id: int 
-    message_thread_id: Optional[int] = None 
     batch_id: str
-    destination_name: str  # <--- Теперь требуем имя канала
\ No newline at end of file
+    # Один получатель (старый формат, его шлет фронт)
+    target_chat_id: Optional[int] = None
+    message_thread_id: Optional[int] = None 
+    destination_name: Optional[str] = None
+    # Несколько получателей сразу: фото готовятся один раз на всех
+    destinations: List[Destination] = []
+
+    def get_destinations(self) -> List[Destination]:
+        """Все получатели партии без дублей по (чат, топик)."""
+        result = list(self.destinations)
+        if self.target_chat_id is not None:
+            result.insert(0, Destination(
+                chat_id=self.target_chat_id,
+                message_thread_id=self.message_thread_id,
+                name=self.destination_name or str(self.target_chat_id),
+            ))
+        unique = {}
+        for dest in result:
+            unique.setdefault((dest.chat_id, dest.message_thread_id), dest)
+        return list(unique.values())
\ No newline at end of file
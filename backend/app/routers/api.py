@@ -1,25 +1,45 @@
+import asyncio
+import hashlib
+import hmac
 import re # <--- Добавили для регулярок
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+import time
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from aiogram import Bot
-from typing import List
+from typing import List, Literal, Optional
 
 from ..config import settings
-from ..models import CarItem, ProcessRequest
-from ..services.parser import fetch_auction_list
-from ..services.processing import process_batch
+from ..models import AuctionQuery, CarItem, ProcessRequest, car_list_adapter
+from ..services.parser import (
+    fetch_auction_list, auction_cache, auction_cache_key, upstream_filters, photos_cache
+)
+from ..services.auction_query import query_auction
+from ..services.image_cache import image_cache
+from ..services.jobs import job_queue
+from ..services.watcher import watcher
 from ..services.logger import logger
+from ..services.events import events
+from ..services.state import state
+from ..services.cleanup import delete_messages_bulk
+from ..services.telegram import get_bot
 from ..database import (
     get_messages_by_batch, 
-    delete_batch_record, 
     get_all_batches, 
     get_all_messages,
-    clear_database
+    delete_message_records,
+    get_job,
+    list_jobs
 )
 
 router = APIRouter(prefix="/api")
 security = HTTPBearer()
+# Для SSE: EventSource в браузере не умеет слать заголовки, поэтому в ?token= передается
+# не пароль, а короткоживущий токен из POST /api/events/token
+optional_security = HTTPBearer(auto_error=False)
+
+# Как часто слать пинг в пустой SSE-поток, чтобы прокси не рвали соединение
+SSE_PING_INTERVAL = 15
 
 # --- ЛОГИКА НОРМАЛИЗАЦИИ ID ---
 def extract_auction_id(raw_input: str) -> str:
@@ -58,6 +78,37 @@ async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(secur
         raise HTTPException(status_code=401, detail="Invalid Token")
     return token
 
+def _stream_signature(expires: int) -> str:
+    return hmac.new(settings.ADMIN_PASSWORD.encode(), f"events:{expires}".encode(), hashlib.sha256).hexdigest()
+
+def issue_stream_token() -> str:
+    """
+    Токен "срок.подпись": подписан паролем, поэтому его проверит любой воркер
+    без общего хранилища. Сам пароль в адрес не попадает.
+    """
+    expires = int(time.time()) + settings.STREAM_TOKEN_TTL
+    return f"{expires}.{_stream_signature(expires)}"
+
+def check_stream_token(token: str) -> bool:
+    expires, _, signature = token.partition(".")
+    # isdigit() пропускает "²" и прочие юникодные цифры, на которых int() падает
+    if not (expires.isascii() and expires.isdigit()) or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(signature, _stream_signature(int(expires)))
+
+async def verify_stream_token(
+    token: Optional[str] = None,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)
+):
+    # С заголовком (curl, скрипты) — как везде пароль; в ?token= — только короткий токен
+    if credentials is not None:
+        if credentials.credentials != settings.ADMIN_PASSWORD:
+            raise HTTPException(status_code=401, detail="Invalid Token")
+        return credentials.credentials
+    if not token or not check_stream_token(token):
+        raise HTTPException(status_code=401, detail="Invalid Token")
+    return token
+
 class CleanupRequest(BaseModel):
     batch_id: str
 
@@ -66,7 +117,24 @@ async def check_auth(token: str = Depends(verify_token)):
     return {"status": "authorized"}
 
 @router.get("/auction/preview", response_model=List[CarItem])
-async def get_auction_preview(sche_id: str, token: str = Depends(verify_token)):
+async def get_auction_preview(
+    sche_id: str,
+    refresh: bool = False,
+    q: Optional[str] = None,
+    min_mileage: Optional[int] = None,
+    max_mileage: Optional[int] = None,
+    min_year: Optional[int] = None,
+    max_year: Optional[int] = None,
+    years: List[int] = Query([]),
+    grades: List[str] = Query([]),
+    lot_from: Optional[int] = None,
+    lot_to: Optional[int] = None,
+    sort: Optional[Literal["lot", "year", "mileage", "name"]] = None,
+    desc: bool = False,
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=5000),
+    token: str = Depends(verify_token)
+):
     # --- ПРИМЕНЯЕМ ФИЛЬТР ТУТ ---
     clean_id = extract_auction_id(sche_id)
     
@@ -76,28 +144,74 @@ async def get_auction_preview(sche_id: str, token: str = Depends(verify_token)):
         logger.info(f"User requested preview for auction: {clean_id}")
     # ----------------------------
 
-    items = await fetch_auction_list(clean_id)
-    logger.info(f"Found {len(items)} items for auction {clean_id}")
-    return items
+    query = AuctionQuery(
+        q=q, min_mileage=min_mileage, max_mileage=max_mileage, min_year=min_year, max_year=max_year,
+        years=years, grades=grades, lot_from=lot_from, lot_to=lot_to, sort=sort, desc=desc,
+        offset=offset, limit=limit
+    )
+
+    # refresh=true — принудительно перечитать аукцион в обход кэша
+    if refresh:
+        auction_cache.invalidate(auction_cache_key(clean_id))
+        auction_cache.invalidate(auction_cache_key(clean_id, upstream_filters(query)))
+
+    if query.is_empty():
+        # Без параметров — весь аукцион, как раньше (так работает фронт)
+        items = await fetch_auction_list(clean_id)
+        total = len(items)
+    else:
+        total, items = await query_auction(clean_id, query)
+    logger.info(f"Found {total} items for auction {clean_id}, returning {len(items)}")
+    # Список уже провалидирован в парсере: сериализуем сразу в байты,
+    # мимо повторной валидации response_model (он остается только для документации).
+    # Сколько всего подошло под фильтр — в заголовке, тело остается списком
+    return Response(
+        car_list_adapter.dump_json(items), media_type="application/json",
+        headers={"X-Total-Count": str(total)}
+    )
 
 @router.post("/process")
 async def start_processing(
     request: ProcessRequest, 
-    background_tasks: BackgroundTasks,
     token: str = Depends(verify_token)
 ):
     if not request.items:
         return {"status": "error", "message": "No cars selected"}
+
+    destinations = request.get_destinations()
+    if not destinations:
+        return {"status": "error", "message": "No destinations selected"}
     
-    background_tasks.add_task(
-        process_batch, 
-        request.items,
-        request.target_chat_id,
-        request.message_thread_id,
-        request.batch_id,
-        request.destination_name
-    )
-    return {"status": "ok", "message": "Processing started"}
+    # Партия уходит в очередь в базе: переживет рестарт, прогресс — в /api/jobs/{batch_id}
+    if not await job_queue.submit(request.items, destinations, request.batch_id):
+        return {"status": "error", "message": "Batch with this id already exists"}
+    return {"status": "ok", "message": "Processing started", "job_id": request.batch_id}
+
+@router.get("/jobs")
+async def get_jobs(limit: int = Query(50, ge=1, le=500), token: str = Depends(verify_token)):
+    return await list_jobs(limit)
+
+@router.get("/jobs/{job_id}")
+async def get_job_status(job_id: str, token: str = Depends(verify_token)):
+    job = await get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str, token: str = Depends(verify_token)):
+    if not await job_queue.cancel(job_id):
+        return {"status": "error", "message": "Job not found or already finished"}
+    return {"status": "ok", "message": "Cancel requested"}
+
+@router.get("/watcher")
+async def get_watcher_status(token: str = Depends(verify_token)):
+    return watcher.status()
+
+@router.post("/watcher/run")
+async def run_watcher(token: str = Depends(verify_token)):
+    """Опросить отслеживаемые аукционы прямо сейчас, не дожидаясь таймера."""
+    return {"status": "ok", "results": await watcher.run_once()}
 
 @router.post("/cleanup")
 async def cleanup_messages(req: CleanupRequest, token: str = Depends(verify_token)):
@@ -105,19 +219,14 @@ async def cleanup_messages(req: CleanupRequest, token: str = Depends(verify_toke
     if not messages:
         return {"status": "error", "message": "Batch not found or already deleted"}
     
-    bot = Bot(token=settings.BOT_TOKEN)
-    deleted_count = 0
-    try:
-        for chat_id, msg_id in messages:
-            try:
-                await bot.delete_message(chat_id=chat_id, message_id=msg_id)
-                deleted_count += 1
-            except Exception:
-                pass
-        await delete_batch_record(req.batch_id)
-    finally:
-        await bot.session.close()
-    return {"status": "ok", "deleted_count": deleted_count}
+    removed = await delete_messages_bulk(get_bot(), messages, req.batch_id)
+    # Из базы убираем только то, что реально исчезло из Телеграма
+    await delete_message_records(removed)
+    return {
+        "status": "ok",
+        "deleted_count": len(removed),
+        "failed_count": len(messages) - len(removed)
+    }
 
 @router.post("/cleanup-all")
 async def cleanup_all_messages(background_tasks: BackgroundTasks, token: str = Depends(verify_token)):
@@ -132,28 +241,68 @@ async def background_cleanup_all():
             logger.info("Nothing to delete.")
             return
 
-        bot = Bot(token=settings.BOT_TOKEN)
-        for chat_id, msg_id in messages:
-            try:
-                await bot.delete_message(chat_id=chat_id, message_id=msg_id)
-                await asyncio.sleep(0.05)
-            except Exception:
-                pass
-        await bot.session.close()
+        removed = await delete_messages_bulk(get_bot(), messages)
         
-        await clear_database()
-        logger.info("☢️ Global cleanup finished. Database cleared.")
+        await delete_message_records(removed)
+        failed = len(messages) - len(removed)
+        logger.info(f"☢️ Global cleanup finished. Deleted {len(removed)} messages, {failed} left in database.")
     except Exception as e:
         logger.error(f"Cleanup failed: {e}")
 
 @router.get("/history")
-async def get_history(token: str = Depends(verify_token)):
-    return await get_all_batches()
+async def get_history(
+    response: Response,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    token: str = Depends(verify_token)
+):
+    # Тело — как раньше, список партий. Курсор следующей страницы — в заголовке
+    items, next_cursor = await get_all_batches(limit, cursor)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return items
 
 @router.get("/destinations")
 async def get_destinations(token: str = Depends(verify_token)):
     return settings.destinations
 
+@router.get("/cache/stats")
+async def get_cache_stats(token: str = Depends(verify_token)):
+    return {"caches": [auction_cache.stats(), photos_cache.stats(), image_cache.stats()]}
+
 @router.get("/logs")
-async def get_logs(token: str = Depends(verify_token)):
-    return {"logs": logger.get_recent_logs()}
\ No newline at end of file
+async def get_logs(batch_id: Optional[str] = None, token: str = Depends(verify_token)):
+    # batch_id — лог конкретной партии, без него — общий хвост
+    return {"logs": await state.recent_logs(batch_id)}
+
+@router.post("/events/token")
+async def get_stream_token(token: str = Depends(verify_token)):
+    """Токен для EventSource: нужен только на момент подключения к /api/events."""
+    return {"token": issue_stream_token(), "expires_in": settings.STREAM_TOKEN_TTL}
+
+@router.get("/events")
+async def stream_events(token: str = Depends(verify_stream_token)):
+    """
+    Поток событий (Server-Sent Events): прогресс партий, очистки и строки лога.
+    Вместо опроса /api/logs — подписка через EventSource.
+    """
+    async def stream():
+        queue = events.subscribe()
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    # str(): строки лога приходят как LazyMessage и собираются здесь
+                    message = str(await asyncio.wait_for(queue.get(), timeout=SSE_PING_INTERVAL))
+                except asyncio.TimeoutError:
+                    message = ": ping\n\n"
+                yield message
+        finally:
+            events.unsubscribe(queue)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        # X-Accel-Buffering: nginx не должен буферизовать поток
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,120 @@
+from collections import OrderedDict
+from typing import Callable, Hashable, List, Tuple
+
+from ..config import settings
+from ..models import AuctionQuery, CarItem
+from .parser import auction_cache, auction_cache_key, fetch_auction_list, upstream_filters
+
+
+def _to_int(value) -> int | None:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class AuctionIndex:
+    """
+    Индекс над закэшированным списком аукциона: лоты и годы разобраны в числа один раз,
+    строка для поиска собрана заранее, сортировки считаются при первом запросе и запоминаются.
+    """
+
+    def __init__(self, items: List[CarItem]):
+        self.items = items
+        self.lots = [_to_int(car.paucXhbtNo) for car in items]
+        self.years = [_to_int(car.carYtiw) for car in items]
+        self._search: List[str] | None = None
+        self._orders: dict[tuple[str, bool], List[int]] = {}
+
+    def search_text(self) -> List[str]:
+        if self._search is None:
+            self._search = [
+                f"{car.paucXhbtNo}\n{car.carEnNm}\n{car.carNo}\n{car.vino}".lower() for car in self.items
+            ]
+        return self._search
+
+    def order(self, sort: str, desc: bool) -> List[int]:
+        """Номера машин в порядке сортировки. Машины без значения — всегда в конце."""
+        key = (sort, desc)
+        if key not in self._orders:
+            if sort == "lot":
+                values = self.lots
+            elif sort == "year":
+                values = self.years
+            elif sort == "mileage":
+                values = [car.trvlDist for car in self.items]
+            else:
+                values = [car.carEnNm.lower() for car in self.items]
+            present = [i for i, value in enumerate(values) if value is not None]
+            missing = [i for i, value in enumerate(values) if value is None]
+            present.sort(key=values.__getitem__, reverse=desc)
+            self._orders[key] = present + missing
+        return self._orders[key]
+
+    def _matcher(self, query: AuctionQuery) -> Callable[[int], bool]:
+        checks: List[Callable[[int], bool]] = []
+        items, lots, years = self.items, self.lots, self.years
+        if query.q:
+            needle = query.q.strip().lower()
+            search = self.search_text()
+            checks.append(lambda i: needle in search[i])
+        if query.min_mileage is not None:
+            checks.append(lambda i: items[i].trvlDist >= query.min_mileage)
+        if query.max_mileage is not None:
+            checks.append(lambda i: items[i].trvlDist <= query.max_mileage)
+        if query.min_year is not None:
+            checks.append(lambda i: years[i] is not None and years[i] >= query.min_year)
+        if query.max_year is not None:
+            checks.append(lambda i: years[i] is not None and years[i] <= query.max_year)
+        if query.years:
+            wanted_years = set(query.years)
+            checks.append(lambda i: years[i] in wanted_years)
+        if query.grades:
+            wanted_grades = set(query.grades)
+            checks.append(lambda i: items[i].grade in wanted_grades)
+        if query.lot_from is not None:
+            checks.append(lambda i: lots[i] is not None and lots[i] >= query.lot_from)
+        if query.lot_to is not None:
+            checks.append(lambda i: lots[i] is not None and lots[i] <= query.lot_to)
+        return lambda i: all(check(i) for check in checks)
+
+    def query(self, query: AuctionQuery) -> Tuple[int, List[CarItem]]:
+        """(сколько всего подошло, машины запрошенной страницы)"""
+        positions = self.order(query.sort, query.desc) if query.sort else range(len(self.items))
+        match = self._matcher(query)
+        matched = [i for i in positions if match(i)]
+        end = None if query.limit is None else query.offset + query.limit
+        return len(matched), [self.items[i] for i in matched[query.offset:end]]
+
+
+# Индексы живут столько же, сколько списки в auction_cache: список сменился — индекс пересобирается
+_indexes: OrderedDict[Hashable, AuctionIndex] = OrderedDict()
+
+
+def get_index(key: Hashable, items: List[CarItem]) -> AuctionIndex:
+    index = _indexes.get(key)
+    if index is None or index.items is not items:
+        index = _indexes[key] = AuctionIndex(items)
+    _indexes.move_to_end(key)
+    while len(_indexes) > settings.AUCTION_CACHE_SIZE:
+        _indexes.popitem(last=False)
+    return index
+
+
+async def query_auction(sche_id: str, query: AuctionQuery) -> Tuple[int, List[CarItem]]:
+    """
+    Превью с фильтрами. Если полный список уже в кэше — фильтруем его.
+    Иначе просим у API только подходящие по пробегу/году строки, остальное доделываем локально.
+    """
+    sche_id = sche_id.strip()
+    key = auction_cache_key(sche_id)
+    items = auction_cache.get(key)
+    if items is not None:
+        auction_cache.hits += 1
+    else:
+        upstream = upstream_filters(query)
+        key = auction_cache_key(sche_id, upstream)
+        items = await fetch_auction_list(sche_id, upstream)
+    if not items:
+        return 0, []
+    return get_index(key, items).query(query)
@@ -0,0 +1,93 @@
+import asyncio
+import time
+from collections import defaultdict
+from typing import TYPE_CHECKING, Iterable, List, Tuple
+
+from .logger import logger
+from .ratelimit import telegram_limiter
+from .events import events
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+
+# deleteMessages принимает до 100 id за раз
+BULK_DELETE_LIMIT = 100
+
+MessageRef = Tuple[int, int]  # (chat_id, message_id)
+
+
+async def delete_messages_bulk(
+    bot: "Bot", messages: Iterable[MessageRef], batch_id: str | None = None
+) -> List[MessageRef]:
+    """
+    Удаляет сообщения пачками через deleteMessages.
+    Чаты обрабатываются параллельно, темп держит лимитер Телеграма.
+    Возвращает только те сообщения, которых в Телеграме больше нет.
+    batch_id — только для событий прогресса (None — глобальная очистка).
+    """
+    by_chat: dict[int, list[int]] = defaultdict(list)
+    for chat_id, msg_id in messages:
+        by_chat[chat_id].append(msg_id)
+    total = sum(len(ids) for ids in by_chat.values())
+
+    started_at = time.perf_counter()
+    events.publish("cleanup", batch_id=batch_id, stage="started", total=total, chats=len(by_chat))
+    results = await asyncio.gather(*(
+        _delete_in_chat(bot, chat_id, msg_ids, batch_id) for chat_id, msg_ids in by_chat.items()
+    ))
+    removed = [ref for chat_removed in results for ref in chat_removed]
+    events.publish(
+        "cleanup", batch_id=batch_id, stage="finished", deleted=len(removed),
+        failed=total - len(removed), ms=round((time.perf_counter() - started_at) * 1000)
+    )
+    return removed
+
+
+async def _delete_in_chat(bot: "Bot", chat_id: int, msg_ids: List[int], batch_id: str | None) -> List[MessageRef]:
+    from aiogram.exceptions import TelegramBadRequest
+
+    started_at = time.perf_counter()
+    removed = []
+    for start in range(0, len(msg_ids), BULK_DELETE_LIMIT):
+        chunk = msg_ids[start:start + BULK_DELETE_LIMIT]
+        try:
+            # True — все из пачки удалены (ненайденные Телеграм просто пропускает)
+            ok = await telegram_limiter.call(
+                chat_id, lambda: bot.delete_messages(chat_id=chat_id, message_ids=chunk), kind="delete"
+            )
+        except TelegramBadRequest as e:
+            logger.warning(f"Bulk delete rejected in chat {chat_id}: {e}. Deleting one by one...")
+            ok = False
+        except Exception as e:
+            logger.error(f"Bulk delete failed in chat {chat_id}: {e}")
+            continue
+
+        if ok:
+            removed.extend((chat_id, msg_id) for msg_id in chunk)
+        else:
+            removed.extend(await _delete_one_by_one(bot, chat_id, chunk))
+    events.publish(
+        "cleanup", batch_id=batch_id, stage="chat", chat_id=chat_id, deleted=len(removed),
+        failed=len(msg_ids) - len(removed), ms=round((time.perf_counter() - started_at) * 1000)
+    )
+    return removed
+
+
+async def _delete_one_by_one(bot: "Bot", chat_id: int, msg_ids: List[int]) -> List[MessageRef]:
+    """Запасной путь: выясняем, какие именно сообщения удалить не получилось."""
+    from aiogram.exceptions import TelegramBadRequest
+
+    removed = []
+    for msg_id in msg_ids:
+        try:
+            await telegram_limiter.call(
+                chat_id, lambda: bot.delete_message(chat_id=chat_id, message_id=msg_id), kind="delete"
+            )
+            removed.append((chat_id, msg_id))
+        except TelegramBadRequest as e:
+            # Сообщения уже нет — для базы это тоже "удалено"
+            if "not found" in str(e).lower():
+                removed.append((chat_id, msg_id))
+        except Exception:
+            pass
+    return removed
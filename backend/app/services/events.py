@@ -0,0 +1,96 @@
+import asyncio
+import json
+import time
+from typing import Callable
+
+
+def _encode(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class LazyMessage:
+    """
+    Событие, которое сериализуется при первом чтении (str), а не при публикации.
+    Один объект на всех подписчиков — текст собирается один раз.
+    """
+
+    __slots__ = ("event", "render", "ts", "_text")
+
+    def __init__(self, event: str, render: Callable[[], dict], ts: float):
+        self.event = event
+        self.render = render
+        self.ts = ts
+        self._text: str | None = None
+
+    def __str__(self) -> str:
+        if self._text is None:
+            data = self.render()
+            data["ts"] = self.ts
+            self._text = _encode(self.event, data)
+        return self._text
+
+
+Message = str | LazyMessage
+
+
+class EventBus:
+    """
+    Рассылка событий прогресса подписчикам (SSE).
+    Событие сериализуется один раз, у каждого подписчика своя ограниченная очередь:
+    медленный клиент теряет самые старые события, а не тормозит отправку партии.
+    """
+
+    def __init__(self, queue_size: int = 256):
+        self.queue_size = queue_size
+        self._subscribers: set[asyncio.Queue] = set()
+        self.dropped = 0
+        # Несколько воркеров: событие уходит в общее состояние, а подписчикам
+        # его раздает relay каждого процесса (см. services/state.py)
+        self.forward: Callable[[Message], None] | None = None
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    @property
+    def active(self) -> bool:
+        """Есть ли кому слать: свои подписчики или другие воркеры."""
+        return bool(self._subscribers) or self.forward is not None
+
+    def publish(self, event: str, **data):
+        # Никто не слушает — ничего не сериализуем
+        if not self.active:
+            return
+        data["ts"] = round(time.time(), 3)
+        self._deliver(_encode(event, data))
+
+    def publish_lazy(self, event: str, render: Callable[[], dict]):
+        """Как publish, но данные (например, текст строки лога) собираются только при чтении."""
+        if not self.active:
+            return
+        self._deliver(LazyMessage(event, render, round(time.time(), 3)))
+
+    def _deliver(self, message: Message):
+        if self.forward is not None:
+            self.forward(message)
+        else:
+            self.fan_out(message)
+
+    def fan_out(self, message: Message):
+        """Подписчики получают str или LazyMessage — текст берется через str(message)."""
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(message)
+
+
+events = EventBus()
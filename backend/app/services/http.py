@@ -0,0 +1,54 @@
+import importlib.util
+from typing import TYPE_CHECKING
+
+from ..config import settings
+
+if TYPE_CHECKING:
+    import httpx
+
+# Один клиент на все приложение: keep-alive и пул соединений к export.skcarrental.com
+_client: "httpx.AsyncClient | None" = None
+
+
+def _http2_enabled() -> bool:
+    # HTTP/2 в httpx требует пакет h2, без него тихо остаемся на HTTP/1.1
+    return settings.HTTP2 and importlib.util.find_spec("h2") is not None
+
+
+def _build_client() -> "httpx.AsyncClient":
+    # httpx (с httpcore, anyio, h2) грузится при создании клиента в lifespan, а не при импорте
+    import httpx
+
+    limits = httpx.Limits(
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(30.0, connect=10.0),
+        limits=limits,
+        http2=_http2_enabled(),
+    )
+
+
+async def init_http_client() -> "httpx.AsyncClient":
+    """Создается в lifespan при старте сервера."""
+    global _client
+    if _client is None:
+        _client = _build_client()
+    return _client
+
+
+def get_http_client() -> "httpx.AsyncClient":
+    """Общий клиент. Если lifespan не запускался (скрипты), создаем на лету."""
+    global _client
+    if _client is None:
+        _client = _build_client()
+    return _client
+
+
+async def close_http_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,180 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+import time
+from collections import OrderedDict
+
+from ..config import settings
+
+
+class DiskImageCache:
+    """
+    Кэш готовых (уже уменьшенных) JPEG на диске.
+    Ключ — sha256 от ссылки на исходник и параметров ресайза.
+    Размер ограничен, при переполнении удаляются давно не использованные файлы.
+
+    Папка общая для всех воркеров uvicorn, а индекс в памяти у каждого свой. Поэтому
+    промах по индексу проверяется на диске (файл мог записать сосед), а при записи индекс
+    раз в RESCAN_INTERVAL пересобирается по папке: предел — на всю папку, не на воркер.
+    """
+
+    RESCAN_INTERVAL = 60.0
+    # Временный файл моложе этого, возможно, еще дописывает другой воркер
+    TMP_MAX_AGE = 600.0
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        # key -> размер файла, в порядке последнего использования
+        self._index: OrderedDict[str, int] = OrderedDict()
+        self._total = 0
+        self._loaded = False
+        self._scanned_at = 0.0
+        self._load_lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def key_for(url: str, params: str) -> str:
+        return hashlib.sha256(f"{params}|{url}".encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        # Раскладываем по подпапкам, чтобы не держать десятки тысяч файлов в одной
+        return os.path.join(self.directory, key[:2], key + ".jpg")
+
+    def _scan(self) -> list[tuple[float, str, int]]:
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        now = time.time()
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if not name.endswith(".jpg"):
+                    # Обрывки недописанных временных файлов
+                    if now - st.st_mtime > self.TMP_MAX_AGE:
+                        try:
+                            os.remove(path)
+                        except OSError:
+                            pass
+                    continue
+                entries.append((st.st_mtime, name[:-4], st.st_size))
+        entries.sort()
+        return entries
+
+    async def _ensure_loaded(self):
+        if self._loaded:
+            return
+        await self._rescan()
+
+    async def _rescan(self):
+        """Индекс заново по папке: mtime — время последнего использования любым воркером."""
+        async with self._load_lock:
+            if self._loaded and time.monotonic() - self._scanned_at < self.RESCAN_INTERVAL:
+                return
+            entries = await asyncio.to_thread(self._scan)
+            self._index = OrderedDict((key, size) for _, key, size in entries)
+            self._total = sum(self._index.values())
+            self._scanned_at = time.monotonic()
+            self._loaded = True
+
+    def _read(self, key: str) -> bytes | None:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            # mtime = время последнего использования, чтобы LRU пережил рестарт
+            os.utime(path)
+            return data
+        except OSError:
+            return None
+
+    def _write(self, key: str, data: bytes):
+        path = self._path(key)
+        folder = os.path.dirname(path)
+        os.makedirs(folder, exist_ok=True)
+        # Пишем во временный файл и атомарно переименовываем: битых файлов в кэше не бывает
+        fd, tmp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _remove(self, keys: list[str]):
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    async def get(self, key: str) -> bytes | None:
+        if not self.enabled:
+            return None
+        await self._ensure_loaded()
+        # На диск идем и без записи в индексе: файл мог положить другой воркер.
+        # Промах и так ведет к скачиванию, лишний open() на его фоне не виден
+        data = await asyncio.to_thread(self._read, key)
+        if data is None:
+            # Файла нет (или его вытеснил другой воркер)
+            self._total -= self._index.pop(key, 0)
+            self.misses += 1
+            return None
+        self._total += len(data) - self._index.pop(key, 0)
+        self._index[key] = len(data)
+        self.hits += 1
+        return data
+
+    async def put(self, key: str, data: bytes):
+        if not self.enabled or len(data) > self.max_bytes:
+            return
+        await self._ensure_loaded()
+        try:
+            await asyncio.to_thread(self._write, key, data)
+        except OSError:
+            return
+
+        self._total -= self._index.pop(key, 0)
+        self._index[key] = len(data)
+        self._total += len(data)
+
+        if time.monotonic() - self._scanned_at >= self.RESCAN_INTERVAL:
+            # Сверяемся с папкой: там и файлы соседей, и уже удаленные ими
+            await self._rescan()
+
+        victims = []
+        while self._total > self.max_bytes and self._index:
+            old_key, size = self._index.popitem(last=False)
+            self._total -= size
+            victims.append(old_key)
+        if victims:
+            await asyncio.to_thread(self._remove, victims)
+
+    name = "image_disk"
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "size": len(self._index),
+            "bytes": self._total,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+image_cache = DiskImageCache(settings.IMAGE_CACHE_DIR, settings.IMAGE_CACHE_MAX_MB * 1024 * 1024)
@@ -0,0 +1,173 @@
+import asyncio
+import math
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from io import BytesIO
+from typing import TYPE_CHECKING
+
+from ..config import settings
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+# Image.Resampling.BICUBIC / BILINEAR: числа, чтобы не грузить Pillow ради профилей
+BICUBIC = 3
+BILINEAR = 2
+
+
+@dataclass(frozen=True)
+class ResizeProfile:
+    """Параметры ресайза. Объект уходит в пул как есть, поэтому только простые поля."""
+    name: str
+    max_side: int
+    quality: int
+    optimize: bool
+    resample: int
+    # JPEG, который уже влезает в max_side и весит не больше этого, отправляется как есть. 0 — всегда пережимать
+    passthrough_bytes: int
+
+    @property
+    def signature(self) -> str:
+        # Входит в ключ дискового кэша: при смене профиля старые файлы просто перестают находиться
+        opt = "opt" if self.optimize else "noopt"
+        return f"{self.max_side}:q{self.quality}:{opt}:r{self.resample}:p{self.passthrough_bytes}:draft"
+
+
+# quality — как было всегда (самый маленький файл, самый медленный save),
+# balanced — без optimize (файл на пару процентов больше, save заметно быстрее),
+# fast — билинейный ресайз и качество пониже
+PROFILES = {
+    "quality": ResizeProfile("quality", 1600, 85, True, BICUBIC, 700 * 1024),
+    "balanced": ResizeProfile("balanced", 1600, 85, False, BICUBIC, 1024 * 1024),
+    "fast": ResizeProfile("fast", 1600, 80, False, BILINEAR, 2 * 1024 * 1024),
+}
+
+# Активный профиль из настроек (неизвестное имя — quality)
+PROFILE = PROFILES.get(settings.IMAGE_PROFILE, PROFILES["quality"])
+RESIZE_SIGNATURE = PROFILE.signature
+
+_executor: Executor | None = None
+_decode_budget: "DecodeBudget | None" = None
+
+
+def _draft(img: "Image.Image", max_side: int):
+    """
+    JPEG можно декодировать сразу в 1/2, 1/4 или 1/8 размера — Pillow не держит
+    в памяти полное разрешение. Масштаб берется такой, чтобы не стать меньше итогового.
+    """
+    width, height = img.size
+    scale = max_side / max(width, height)
+    if scale < 1:
+        img.draft("RGB", (math.ceil(width * scale), math.ceil(height * scale)))
+
+
+def decoded_size(data: bytes, profile: ResizeProfile = PROFILE) -> int:
+    """
+    Сколько памяти займет декодированная картинка. Читает только заголовок, поэтому дешево.
+    Pillow хранит RGB по 4 байта на пиксель.
+    """
+    from PIL import Image
+
+    try:
+        with Image.open(BytesIO(data)) as img:
+            _draft(img, profile.max_side)
+            width, height = img.size
+    except Exception:
+        # Битый файл все равно упадет в resize_image
+        return len(data)
+    return width * height * 4 + len(data)
+
+
+def _can_pass_through(img: "Image.Image", size: int, profile: ResizeProfile) -> bool:
+    """Оригинал уже годится для Телеграма: JPEG, влезает по размеру и весу, без поворота в EXIF."""
+    return (
+        img.format == "JPEG"
+        and img.mode in ("RGB", "L")
+        and max(img.size) <= profile.max_side
+        and size <= profile.passthrough_bytes
+        # Поворот из EXIF при пережатии теряется, а Телеграм его применяет — не рискуем
+        and img.getexif().get(0x0112, 1) == 1
+    )
+
+
+def resize_image(data: bytes, profile: ResizeProfile = PROFILE) -> bytes:
+    """
+    Декодирует, уменьшает и пережимает фото в JPEG.
+    Маленький JPEG возвращается как есть, без декодирования.
+    Чистая CPU-функция: выполняется в пуле, а не в event loop.
+    """
+    # Pillow нужен только здесь: импорт при первом ресайзе (в пуле процессов — в каждом воркере)
+    from PIL import Image
+
+    with Image.open(BytesIO(data)) as img:
+        if _can_pass_through(img, len(data), profile):
+            return bytes(data)
+        _draft(img, profile.max_side)
+        img = img.convert("RGB")
+        img.thumbnail((profile.max_side, profile.max_side), profile.resample)
+        output = BytesIO()
+        img.save(output, format="JPEG", quality=profile.quality, optimize=profile.optimize)
+        return output.getvalue()
+
+
+def get_image_executor() -> Executor:
+    """Пул для Pillow. Создается при первом обращении."""
+    global _executor
+    if _executor is None:
+        workers = max(1, settings.IMAGE_WORKERS)
+        if settings.IMAGE_EXECUTOR == "process":
+            _executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            # Pillow отпускает GIL на декодировании/кодировании, потоков обычно хватает
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pillow")
+    return _executor
+
+
+def shutdown_image_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+
+
+class DecodeBudget:
+    """
+    Семафор по байтам: сумма decoded_size одновременно обрабатываемых картинок
+    не больше limit. Картинка крупнее всего бюджета ждет, пока он не освободится целиком.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_use = 0
+        self._condition = asyncio.Condition()
+
+    @asynccontextmanager
+    async def reserve(self, size: int):
+        if self.limit <= 0:
+            yield
+            return
+        size = min(size, self.limit)
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_use + size <= self.limit)
+            self.in_use += size
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self.in_use -= size
+                self._condition.notify_all()
+
+
+def get_decode_budget() -> DecodeBudget:
+    global _decode_budget
+    if _decode_budget is None:
+        _decode_budget = DecodeBudget(settings.IMAGE_DECODE_BUDGET_MB * 1024 * 1024)
+    return _decode_budget
+
+
+async def resize_image_async(data: bytes) -> bytes:
+    """Ресайз в пуле, но не больше бюджета памяти на декодирование одновременно."""
+    async with get_decode_budget().reserve(decoded_size(data)):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_image_executor(), resize_image, data, PROFILE)
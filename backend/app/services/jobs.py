@@ -0,0 +1,173 @@
+import asyncio
+import json
+import time
+from typing import List
+
+from ..config import settings
+from ..models import CarRequestItem, Destination
+from ..database import (
+    create_job,
+    claim_job,
+    get_job,
+    get_job_tasks,
+    mark_job_task,
+    set_job_status,
+    get_queued_jobs,
+    heartbeat_jobs,
+    requeue_interrupted_jobs
+)
+from .processing import process_batch
+from .logger import logger
+from .state import WORKER_ID
+
+
+class JobQueue:
+    """
+    Очередь партий на отправку поверх SQLite.
+    Партия = job, в базе лежит по строке на каждую пару (машина, получатель).
+    Одновременно крутится не больше max_concurrent партий; после рестарта
+    недоделанные партии продолжаются с последнего чекпоинта.
+
+    Воркеров uvicorn может быть несколько: партию забирает тот, кто первым сделал
+    claim_job, и продлевает ее пульсом. Партии воркера, который перестал отзываться
+    дольше LEASE секунд, возвращаются в очередь. Все это живет в history.db, поэтому
+    от STATE_BACKEND не зависит: соседний воркер ничего не отправит второй раз.
+    """
+
+    # Как часто проверять очередь без сигнала: партию мог поставить другой воркер
+    POLL_INTERVAL = 2.0
+    HEARTBEAT_INTERVAL = 5.0
+    LEASE = 30.0
+    # Пауза планировщика после ошибки базы
+    ERROR_BACKOFF = 5.0
+
+    def __init__(self, max_concurrent: int):
+        self.max_concurrent = max(1, max_concurrent)
+        # job_id -> (задача, флаг отмены)
+        self._running: dict[str, tuple[asyncio.Task, asyncio.Event]] = {}
+        # Партии, которые этот воркер уже забрал в базе (только их и продлеваем)
+        self._claimed: set[str] = set()
+        self._wakeup = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+
+    async def start(self):
+        # Только партии, чей воркер давно молчит: остальные, возможно, сейчас крутятся
+        # у соседнего воркера. После чистой остановки stop() уже вернул свои в очередь,
+        # после падения — подхватим, как только истечет пульс (см. _heartbeat_loop)
+        resumed = await requeue_interrupted_jobs(time.time() - self.LEASE)
+        if resumed:
+            logger.warning(f"♻️ Resuming {resumed} interrupted batch(es) after restart")
+        self._tasks = [
+            asyncio.create_task(self._schedule_loop()),
+            asyncio.create_task(self._heartbeat_loop()),
+        ]
+
+    async def stop(self):
+        """Остановка сервера: задачи прерываются, их партии сразу возвращаются в очередь."""
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        tasks = [task for task, _ in self._running.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # Ни соседям, ни следующему запуску не надо ждать, пока истечет пульс
+        await requeue_interrupted_jobs(worker_id=WORKER_ID)
+
+    async def submit(self, items: List[CarRequestItem], destinations: List[Destination], job_id: str) -> bool:
+        """Ставит партию в очередь. False — партия с таким id уже есть."""
+        destinations_json = json.dumps([d.model_dump() for d in destinations], ensure_ascii=False)
+        created = await create_job(
+            job_id, destinations_json, [(item.id, item.caption) for item in items], len(destinations)
+        )
+        if created:
+            self._wakeup.set()
+        return created
+
+    async def cancel(self, job_id: str) -> bool:
+        cancelled = await set_job_status(job_id, "cancelled", only_if=("queued", "running"))
+        running = self._running.get(job_id)
+        if running is not None:
+            # Партия остановится между машинами, отправленное уже отмечено
+            running[1].set()
+        return cancelled
+
+    def active_jobs(self) -> int:
+        return len(self._running)
+
+    async def _schedule_loop(self):
+        while True:
+            # Сбрасываем флаг до запроса в базу, чтобы не потерять сигнал от submit
+            self._wakeup.clear()
+            free = self.max_concurrent - len(self._running)
+            try:
+                if free > 0:
+                    for job_id in await get_queued_jobs(free):
+                        if job_id not in self._running:
+                            cancelled = asyncio.Event()
+                            task = asyncio.create_task(self._run(job_id, cancelled))
+                            self._running[job_id] = (task, cancelled)
+            except Exception as e:
+                # Например, "database is locked": планировщик не должен умереть молча —
+                # ждем и пробуем снова
+                logger.error("Job scheduler failed: %s", e)
+                await asyncio.sleep(self.ERROR_BACKOFF)
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.HEARTBEAT_INTERVAL)
+            try:
+                job_ids = list(self._claimed)
+                owned = await heartbeat_jobs(WORKER_ID, job_ids)
+                for job_id in job_ids:
+                    running = self._running.get(job_id)
+                    # Партию отменили через другой воркер (или ее забрал сосед) — останавливаемся
+                    if job_id not in owned and running is not None:
+                        running[1].set()
+                stale = await requeue_interrupted_jobs(time.time() - self.LEASE)
+                if stale:
+                    logger.warning("♻️ Requeued %s batch(es) of a silent worker", stale)
+                    self._wakeup.set()
+            except Exception as e:
+                logger.warning("Job heartbeat failed: %s", e)
+
+    async def _run(self, job_id: str, cancelled: asyncio.Event):
+        try:
+            if not await claim_job(job_id, WORKER_ID):
+                return
+            self._claimed.add(job_id)
+            job = await get_job(job_id)
+            destinations = [Destination(**d) for d in job["destinations"]]
+
+            items: dict[int, CarRequestItem] = {}
+            skip = set()
+            for car_index, dest_index, car_id, caption, status in await get_job_tasks(job_id):
+                items[car_index] = CarRequestItem(id=car_id, caption=caption)
+                if status != "pending":
+                    skip.add((car_index, dest_index))
+
+            async def on_result(car_index: int, dest_index: int, result: str):
+                await mark_job_task(job_id, car_index, dest_index, result)
+
+            status = await process_batch(
+                [items[i] for i in sorted(items)], destinations, job_id, skip, on_result, cancelled
+            )
+            # Если партию отменили через API, статус уже cancelled
+            await set_job_status(job_id, status, only_if=("running",))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Job %s crashed: %s", job_id, e, batch_id=job_id)
+            await set_job_status(job_id, "failed", only_if=("running",))
+        finally:
+            self._running.pop(job_id, None)
+            self._claimed.discard(job_id)
+            self._wakeup.set()
+
+
+job_queue = JobQueue(settings.JOB_MAX_CONCURRENT)
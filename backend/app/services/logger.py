@@ -1,28 +1,123 @@
-from collections import deque
-from datetime import datetime
+import atexit
+import queue
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable
+
+from .events import events
+
+
+class LogRecord:
+    """Компактная запись лога. Текст собирается только когда он кому-то нужен."""
+
+    __slots__ = ("created", "level", "msg", "args", "batch_id", "_text")
+
+    def __init__(self, created: float, level: str, msg: str, args: tuple, batch_id: str | None):
+        self.created = created
+        self.level = level
+        self.msg = msg
+        self.args = args
+        self.batch_id = batch_id
+        self._text: str | None = None
+
+    @property
+    def message(self) -> str:
+        return self.msg % self.args if self.args else self.msg
+
+    def format(self) -> str:
+        if self._text is None:
+            timestamp = time.strftime("%H:%M:%S", time.localtime(self.created))
+            self._text = f"[{timestamp}] [{self.level}] {self.message}"
+        return self._text
+
 
 class MemoryLogger:
-    def __init__(self, max_len=100):
+    """
+    Лог для UI и консоли.
+    Записи хранятся в кольцевых буферах: общий (последние max_len) и по одному на партию,
+    чтобы параллельные партии не затирали историю друг друга. Буферов партий не больше
+    max_batches — самые старые выкидываются. В stdout пишет отдельный поток,
+    event loop на print не ждет.
+    """
+
+    def __init__(self, max_len: int = 100, batch_max_len: int = 200, max_batches: int = 20):
         # deque автоматически удаляет старые записи, когда переполняется
-        self.logs = deque(maxlen=max_len)
+        self.logs: deque[LogRecord] = deque(maxlen=max_len)
+        self.batch_max_len = batch_max_len
+        self.max_batches = max_batches
+        self._batches: OrderedDict[str, deque[LogRecord]] = OrderedDict()
+        self._out: queue.SimpleQueue = queue.SimpleQueue()
+        self._writer: threading.Thread | None = None
+        # Куда еще отдавать записи (общее состояние нескольких воркеров, см. services/state.py)
+        self.sink: Callable[[LogRecord], None] | None = None
+
+    def debug(self, message: str, *args, batch_id: str | None = None):
+        # Отладка — только в консоль сервера, в UI не попадает
+        self._emit(LogRecord(time.time(), "DEBUG", message, args, batch_id))
+
+    def info(self, message: str, *args, batch_id: str | None = None):
+        self._add("INFO", message, args, batch_id)
+
+    def error(self, message: str, *args, batch_id: str | None = None):
+        self._add("ERROR", message, args, batch_id)
+
+    def warning(self, message: str, *args, batch_id: str | None = None):
+        self._add("WARNING", message, args, batch_id)
+
+    def _add(self, level: str, message: str, args: tuple, batch_id: str | None):
+        record = LogRecord(time.time(), level, message, args, batch_id)
+        self.logs.append(record)
+        if batch_id:
+            buffer = self._batches.get(batch_id)
+            if buffer is None:
+                buffer = self._batches[batch_id] = deque(maxlen=self.batch_max_len)
+                while len(self._batches) > self.max_batches:
+                    self._batches.popitem(last=False)
+            else:
+                self._batches.move_to_end(batch_id)
+            buffer.append(record)
+        self._emit(record)
+        if self.sink is not None:
+            self.sink(record)
+        # Текст строки собирается, только когда событие реально читают
+        events.publish_lazy("log", lambda: {"level": level, "text": record.format(), "batch_id": batch_id})
 
-    def info(self, message: str):
-        self._add("INFO", message)
+    def _emit(self, record: LogRecord):
+        # Дублируем в консоль сервера через фоновый поток
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, name="log-writer", daemon=True)
+            self._writer.start()
+        self._out.put(record)
 
-    def error(self, message: str):
-        self._add("ERROR", message)
+    def _write_loop(self):
+        while True:
+            record = self._out.get()
+            try:
+                sys.stdout.write(record.format() + "\n")
+                sys.stdout.flush()
+            except Exception:
+                pass
 
-    def warning(self, message: str):
-        self._add("WARNING", message)
+    def flush(self):
+        """Дописывает хвост очереди в stdout (при выходе процесса)."""
+        while True:
+            try:
+                record = self._out.get_nowait()
+            except queue.Empty:
+                break
+            sys.stdout.write(record.format() + "\n")
+        sys.stdout.flush()
 
-    def _add(self, level: str, message: str):
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        entry = f"[{timestamp}] [{level}] {message}"
-        print(entry) # Дублируем в консоль сервера
-        self.logs.append(entry)
+    def get_recent_logs(self, batch_id: str | None = None) -> list[str]:
+        if batch_id is not None:
+            records = self._batches.get(batch_id, ())
+        else:
+            records = self.logs
+        return [record.format() for record in records]
 
-    def get_recent_logs(self):
-        return list(self.logs)
 
 # Создаем глобальный экземпляр логгера
-logger = MemoryLogger()
\ No newline at end of file
+logger = MemoryLogger()
+atexit.register(logger.flush)
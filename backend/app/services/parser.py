@@ -1,133 +1,258 @@
-import httpx
+import asyncio
+import math
 from typing import List
-from ..models import CarItem
+
+from pydantic import ValidationError
+
+from ..config import settings
+from ..models import AuctionList, AuctionQuery, CarItem, car_list_adapter
+from .http import get_http_client
+from .cache import AsyncTTLCache
+from .logger import logger
+from .metrics import AUCTION_PAGE_SECONDS
 
 # Базовые URL
-BASE_API_URL = "https://export.skcarrental.com/skr/common/uscr-chnl-comm-bff/open/get/expt-pauc/car/list"
-DETAIL_URL_TEMPLATE = "https://export.skcarrental.com/exptpauc/ExptPaucDetail/{sche_id}/{car_id}/1"
-IMG_API_URL = "https://export.skcarrental.com/skr/common/uscr-chnl-comm-bff/open/get/expt-pauc/car-img"
-BASE_IMG_HOST = "https://export.skcarrental.com/skr/common/comm-img-srvr"
+SK_BASE_URL = settings.SK_BASE_URL.rstrip("/")
+BASE_API_URL = f"{SK_BASE_URL}/skr/common/uscr-chnl-comm-bff/open/get/expt-pauc/car/list"
+DETAIL_URL_PREFIX = f"{SK_BASE_URL}/exptpauc/ExptPaucDetail"
+DETAIL_URL_TEMPLATE = DETAIL_URL_PREFIX + "/{sche_id}/{car_id}/1"
+IMG_API_URL = f"{SK_BASE_URL}/skr/common/uscr-chnl-comm-bff/open/get/expt-pauc/car-img"
+BASE_IMG_HOST = f"{SK_BASE_URL}/skr/common/comm-img-srvr"
 
 # Headers обязательны
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
     "Accept": "application/json, text/plain, */*",
-    "Referer": "https://export.skcarrental.com/",
-    "Origin": "https://export.skcarrental.com"
+    "Referer": f"{SK_BASE_URL}/",
+    "Origin": SK_BASE_URL
 }
 
-async def fetch_auction_list(sche_id: str) -> List[CarItem]:
+# Размер страницы списка авто
+PAGE_LIMIT = 100
+
+# Кэши: превью аукциона (по ID аукциона) и ссылки на фото (по uscrId)
+auction_cache = AsyncTTLCache("auction_list", settings.AUCTION_CACHE_TTL, settings.AUCTION_CACHE_SIZE)
+photos_cache = AsyncTTLCache("car_photos", settings.PHOTOS_CACHE_TTL, settings.PHOTOS_CACHE_SIZE)
+
+
+def _list_params(sche_id: str, page_index: int, limit: int, upstream: dict | None = None) -> dict:
+    # Полный набор параметров. upstream — фильтры, которые умеет сам API (см. upstream_filters)
+    params = {
+        "langCd": "en",
+        "uscrPaucScheId": sche_id,
+        "srchInputText": "",
+        "carGbnlist": "",
+        "uscrMakrIdList": "",
+        "minTrvlDist": "0",
+        "maxTrvlDist": "9999999999",
+        "minCarYtiw": "0",
+        "maxCarYtiw": "9999",
+        "sortOrdrCd": "A",
+        "uscrAfcoId": "undefined",
+        "chkBidYn": "",
+        "irstCarYn": "N",
+        "paucChnlCd": "X61501",
+        "carNm": "",
+        "limit": limit,
+        "offset": page_index,
+    }
+    if upstream:
+        params.update(upstream)
+    return params
+
+
+def upstream_filters(query: AuctionQuery) -> dict:
+    """
+    Часть фильтров превью, которую можно отдать самому API, чтобы он прислал меньше строк.
+    Только диапазоны пробега и года: смысл параметров однозначен. Текстовый поиск
+    API ищет неизвестно по каким полям, поэтому он остается локальным.
+    """
+    params = {}
+    if query.min_mileage is not None:
+        params["minTrvlDist"] = str(query.min_mileage)
+    if query.max_mileage is not None:
+        params["maxTrvlDist"] = str(query.max_mileage)
+    # Список годов сужаем до диапазона, точный отбор — локально
+    min_years = [y for y in (query.min_year, min(query.years, default=None)) if y is not None]
+    max_years = [y for y in (query.max_year, max(query.years, default=None)) if y is not None]
+    if min_years:
+        params["minCarYtiw"] = str(max(min_years))
+    if max_years:
+        params["maxCarYtiw"] = str(min(max_years))
+    return params
+
+
+async def _fetch_page(sche_id: str, page_index: int, limit: int, upstream: dict | None = None) -> dict | None:
+    """
+    Запрашивает одну страницу списка. Возвращает body ответа или None при ошибке.
+    """
+    client = get_http_client()
+    try:
+        logger.debug("Requesting page %d for %s...", page_index, sche_id)
+        
+        with AUCTION_PAGE_SECONDS.time():
+            response = await client.get(
+                BASE_API_URL, params=_list_params(sche_id, page_index, limit, upstream), headers=HEADERS, timeout=30.0
+            )
+        response.raise_for_status()
+        data = response.json()
+        
+        # --- СТРОГАЯ ПРОВЕРКА ОТВЕТА ---
+        res_code = data.get("result")
+        api_code = data.get("code")
+        body = data.get("body")
+        msg = data.get("message")
+
+        # Если хотя бы один параметр не ок — это ошибка
+        if res_code != 0 or api_code != 0 or body is None:
+            if api_code == 20000:
+                logger.warning("⚠️ Auction ID %s not found or data is empty (Code 20000).", sche_id)
+            else:
+                logger.warning("⚠️ API Error: Result=%s, Code=%s, Message='%s'", res_code, api_code, msg)
+            return None
+        # -------------------------------
+
+        logger.debug(
+            "Page %d received %d items. Total: %s", page_index, len(body.get("list") or []), body.get("total", 0)
+        )
+        return body
+    except Exception as e:
+        logger.warning("Parsing error at page %d: %s", page_index, e)
+        return None
+
+
+def _build_row(item: dict, sche_id: str, link_prefix: str) -> dict:
+    """
+    Сырая строка API -> поля CarItem. Валидация потом одна на весь список.
+    API присылает null вместо пустых полей — такие тоже заменяем значением по умолчанию.
+    """
+    get = item.get
+    c_id = item["uscrId"]
+    return {
+        "uscrId": c_id,
+        "uscrPaucScheId": get("uscrPaucScheId") or sche_id,
+        "paucXhbtNo": get("paucXhbtNo") or "Unknown",
+        "carNo": get("carNo") or "",
+        "carEnNm": get("carEnNm") or get("carNm") or "No Name",
+        "carYtiw": get("carYtiw") or "",
+        "vino": get("vino") or "",
+        # То же, что DETAIL_URL_TEMPLATE, без format() на каждую строку
+        "link": f"{link_prefix}{c_id}/1",
+        "trvlDist": get("trvlDist") or 0,
+        "grade": get("aprGrad") or "",
+    }
+
+
+def _validate_rows(rows: List[dict], sche_id: str) -> List[CarItem]:
+    """Весь список одним вызовом. Если какие-то строки не прошли — отбрасываем только их."""
+    try:
+        return car_list_adapter.validate_python(rows)
+    except ValidationError as e:
+        # loc[0] — номер строки в списке
+        bad = {error["loc"][0] for error in e.errors()}
+        logger.warning("⚠️ Auction %s: skipping %d invalid row(s): %s", sche_id, len(bad), e.errors()[0]["msg"])
+        return car_list_adapter.validate_python([row for i, row in enumerate(rows) if i not in bad])
+
+
+def auction_cache_key(sche_id: str, upstream: dict | None = None):
+    # Полный список — просто по ID (его сбрасывают watcher и refresh), суженный — вместе с фильтрами
+    return (sche_id, tuple(sorted(upstream.items()))) if upstream else sche_id
+
+
+def _is_complete(items: AuctionList) -> bool:
+    return bool(items) and items.complete
+
+
+async def fetch_auction_list(sche_id: str, upstream: dict | None = None) -> AuctionList:
+    """
+    Список авто аукциона через кэш. upstream — фильтры на стороне API.
+    Неполный список (см. AuctionList.complete) отдается, но не кэшируется.
+    """
+    sche_id = sche_id.strip()
+    return await auction_cache.get_or_fetch(
+        auction_cache_key(sche_id, upstream), lambda: _load_auction_list(sche_id, upstream), _is_complete
+    )
+
+
+async def _load_auction_list(sche_id: str, upstream: dict | None = None) -> AuctionList:
     """
     Парсит список авто. Обрабатывает ошибки API (неверный ID).
+    Первая страница дает total, остальные запрашиваются параллельно
+    (не больше AUCTION_PAGE_CONCURRENCY одновременно).
     """
-    clean_items = []
-    limit = 100
-    page_index = 0
-    
-    async with httpx.AsyncClient(timeout=30.0, headers=HEADERS) as client:
-        while True:
-            # Полный набор параметров
-            params = {
-                "langCd": "en",
-                "uscrPaucScheId": sche_id,
-                "srchInputText": "",
-                "carGbnlist": "",
-                "uscrMakrIdList": "",
-                "minTrvlDist": "0",
-                "maxTrvlDist": "9999999999",
-                "minCarYtiw": "0",
-                "maxCarYtiw": "9999",
-                "sortOrdrCd": "A",
-                "uscrAfcoId": "undefined",
-                "chkBidYn": "",
-                "irstCarYn": "N",
-                "paucChnlCd": "X61501",
-                "carNm": "",
-                "limit": limit,
-                "offset": page_index,
-            }
-            
-            try:
-                print(f"DEBUG: Requesting page {page_index} for {sche_id}...") 
-                
-                response = await client.get(BASE_API_URL, params=params)
-                response.raise_for_status()
-                data = response.json()
-                
-                # --- СТРОГАЯ ПРОВЕРКА ОТВЕТА ---
-                res_code = data.get("result")
-                api_code = data.get("code")
-                body = data.get("body")
-                msg = data.get("message")
-
-                # Если хотя бы один параметр не ок — это ошибка
-                if res_code != 0 or api_code != 0 or body is None:
-                    if api_code == 20000:
-                        print(f"⚠️ Auction ID {sche_id} not found or data is empty (Code 20000).")
-                    else:
-                        print(f"⚠️ API Error: Result={res_code}, Code={api_code}, Message='{msg}'")
-                    
-                    # Прерываем цикл, возвращаем то, что успели собрать (или пустоту)
-                    break
-                # -------------------------------
-                
-                total = body.get("total", 0)
-                raw_list = body.get("list", [])
-                
-                print(f"DEBUG: Page {page_index} received {len(raw_list)} items. Total: {total}")
-
-                if not raw_list:
-                    break
-
-                for item in raw_list:
-                    c_id = item.get("uscrId")
-                    if not c_id: continue
-
-                    link = DETAIL_URL_TEMPLATE.format(sche_id=sche_id, car_id=c_id)
-                    
-                    car = CarItem(
-                        uscrId=c_id,
-                        uscrPaucScheId=item.get("uscrPaucScheId", sche_id),
-                        paucXhbtNo=item.get("paucXhbtNo", "Unknown"),
-                        carNo=item.get("carNo", ""),
-                        carEnNm=item.get("carEnNm") or item.get("carNm", "No Name"),
-                        carYtiw=item.get("carYtiw", ""),
-                        vino=item.get("vino", ""),
-                        link=link,
-                        trvlDist=item.get("trvlDist", 0),
-                        grade=item.get("aprGrad", "")
-                    )
-                    clean_items.append(car)
-                
-                if len(clean_items) >= total:
-                    break
-                
-                if len(raw_list) < limit:
-                    break
-                
-                page_index += 1
-                
-            except Exception as e:
-                print(f"Parsing error at page {page_index}: {e}")
-                break
-                
-    return clean_items
+    limit = PAGE_LIMIT
+
+    first = await _fetch_page(sche_id, 0, limit, upstream)
+    if first is None:
+        return AuctionList(complete=False)
+    pages = [first.get("list") or []]
+    complete = True
+
+    total = first.get("total", 0)
+    if len(pages[0]) >= limit and total > len(pages[0]):
+        page_count = math.ceil(total / limit)
+        semaphore = asyncio.Semaphore(max(1, settings.AUCTION_PAGE_CONCURRENCY))
+
+        async def fetch_limited(page_index: int) -> dict | None:
+            async with semaphore:
+                return await _fetch_page(sche_id, page_index, limit, upstream)
+
+        bodies = await asyncio.gather(*(fetch_limited(i) for i in range(1, page_count)))
+        for page_index, body in enumerate(bodies, 1):
+            if body is None:
+                # Битую страницу пропускаем, остальное отдаем
+                logger.warning("⚠️ Page %d for %s failed, skipping.", page_index, sche_id)
+                complete = False
+                continue
+            pages.append(body.get("list") or [])
+
+    # Склеиваем по порядку страниц. Параллельные страницы могут пересекаться,
+    # если список на сервере сдвинулся — дубли по uscrId выкидываем
+    rows = []
+    seen = set()
+    link_prefix = f"{DETAIL_URL_PREFIX}/{sche_id}/"
+    try:
+        for raw_list in pages:
+            for item in raw_list:
+                if not isinstance(item, dict):
+                    continue
+                c_id = item.get("uscrId")
+                if not c_id or c_id in seen:
+                    continue
+                seen.add(c_id)
+                rows.append(_build_row(item, sche_id, link_prefix))
+        if len(rows) < total:
+            # Страницы сдвинулись во время чтения (дубли) или API недодал строк
+            logger.warning("⚠️ Auction %s: got %d of %d cars, list is incomplete.", sche_id, len(rows), total)
+            complete = False
+        return AuctionList(_validate_rows(rows, sche_id), complete)
+    except Exception as e:
+        # Превью не должно падать с 500 из-за странного ответа API
+        logger.error("Failed to parse auction %s: %s", sche_id, e)
+        return AuctionList(complete=False)
 
 async def fetch_car_photos(car_id: str) -> List[str]:
+    """Ссылки на фото авто через кэш."""
+    return await photos_cache.get_or_fetch(car_id, lambda: _load_car_photos(car_id))
+
+
+async def _load_car_photos(car_id: str) -> List[str]:
     # Фото мы пока не трогали, они работали, но добавил headers на всякий случай
-    async with httpx.AsyncClient(timeout=10.0, headers=HEADERS) as client:
-        try:
-            resp = await client.get(IMG_API_URL, params={"langCd": "en", "uscrId": car_id})
-            data = resp.json()
-            # Здесь тоже можно добавить строгую проверку, но для фото обычно body просто пустой
-            if data.get("result") != 0 or not data.get("body"): 
-                return []
-                
-            photos = []
-            for img_data in data["body"]:
-                partial_path = img_data.get("fileUadr")
-                if partial_path:
-                    photos.append(BASE_IMG_HOST + partial_path)
-            return photos
-        except Exception:
-            return []
\ No newline at end of file
+    client = get_http_client()
+    try:
+        resp = await client.get(
+            IMG_API_URL, params={"langCd": "en", "uscrId": car_id}, headers=HEADERS, timeout=10.0
+        )
+        data = resp.json()
+        # Здесь тоже можно добавить строгую проверку, но для фото обычно body просто пустой
+        if data.get("result") != 0 or not data.get("body"): 
+            return []
+            
+        photos = []
+        for img_data in data["body"]:
+            partial_path = img_data.get("fileUadr")
+            if partial_path:
+                photos.append(BASE_IMG_HOST + partial_path)
+        return photos
+    except Exception:
+        return []
\ No newline at end of file
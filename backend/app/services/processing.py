@@ -1,146 +1,555 @@
 import asyncio
-from io import BytesIO
-from typing import List, Optional
-import httpx
-from PIL import Image
-from aiogram import Bot
-from aiogram.types import InputMediaPhoto, BufferedInputFile, Message
-from aiogram.exceptions import TelegramRetryAfter, TelegramNetworkError
-from aiogram.client.session.aiohttp import AiohttpSession  # <--- ВАЖНЫЙ ИМПОРТ
+import time
+from typing import TYPE_CHECKING, Awaitable, Callable, List, Optional, Set, Tuple
 
 from ..config import settings
-from ..models import CarRequestItem
+from ..models import CarRequestItem, Destination
 from .parser import fetch_car_photos
+from .images import resize_image_async, RESIZE_SIGNATURE
+from .image_cache import image_cache
+from .http import get_http_client
+from .telegram import get_bot
 from .logger import logger
-from ..database import save_message_ids
+from .ratelimit import telegram_limiter
+from .events import events
+from .metrics import STAGE_SECONDS, DOWNLOAD_FAILURES, UPLOADED_BYTES, ALBUMS_SENT
+from ..database import (
+    save_message_ids, get_file_ids, save_file_ids, delete_file_ids, flush_db,
+    start_batch, finish_batch
+)
+
+# aiogram и httpx грузятся при первой партии (или заранее в lifespan), не при импорте
+if TYPE_CHECKING:
+    import httpx
+    from aiogram import Bot
+    from aiogram.types import InputMediaPhoto, Message
+
+
+# Очереди конвейеров запущенных партий — для метрики глубины очереди
+active_pipeline_queues: Set[asyncio.Queue] = set()
+
+# Дочерние метрики заранее, чтобы на горячем пути не искать их по меткам
+_LOOKUP_SECONDS = STAGE_SECONDS.labels("photo_lookup")
+_PREPARE_SECONDS = STAGE_SECONDS.labels("prepare")
+_DOWNLOAD_SECONDS = STAGE_SECONDS.labels("download")
+_RESIZE_SECONDS = STAGE_SECONDS.labels("resize")
+_SEND_SECONDS = STAGE_SECONDS.labels("send")
+_ALBUMS_DONE = ALBUMS_SENT.labels("done")
+_ALBUMS_FAILED = ALBUMS_SENT.labels("failed")
+
+
+class PreparedPhoto:
+    """Одно фото альбома: либо уже известный file_id в Телеграме, либо готовые байты."""
+
+    def __init__(self, url: str, file_id: str | None = None, data: bytes | None = None):
+        self.url = url
+        self.file_id = file_id
+        self.data = data
+
+
+class PreparedCar:
+    """Готовый к отправке альбом одной машины, общий для всех получателей."""
+
+    def __init__(self, index: int, item: CarRequestItem, photos: List[PreparedPhoto], targets: List[int]):
+        self.index = index
+        self.item = item
+        self.photos = photos
+        # Номера получателей, которым еще нужно отправить. Первый из них загружает байты
+        self.targets = targets
+        self.uploader = targets[0]
+        # Загрузивший получатель закончил — у фото появились file_id
+        self.uploaded = asyncio.Event()
+        self._pending = len(targets)
+
+    def release(self):
+        """Получатель закончил с альбомом. После последнего байты больше не нужны."""
+        self._pending -= 1
+        if self._pending <= 0:
+            for photo in self.photos:
+                photo.data = None
+
+
+# Результат по машине для одного получателя: (номер машины, номер получателя, "done" | "failed")
+ResultCallback = Callable[[int, int, str], Awaitable[None]]
+
 
 async def process_batch(
     items: List[CarRequestItem], 
-    target_chat_id: int, 
-    message_thread_id: Optional[int], 
+    destinations: List[Destination],
     batch_id: str,
-    destination_name: str
-):
+    skip: Optional[Set[Tuple[int, int]]] = None,
+    on_result: Optional[ResultCallback] = None,
+    cancelled: Optional[asyncio.Event] = None
+) -> str:
     """
-    Основная функция обработки с увеличенным таймаутом.
+    Основная функция обработки.
+    Работает конвейером: поиск фото и скачивание/ресайз идут на несколько
+    машин вперед, а отправка забирает готовые альбомы строго по порядку.
+    Фото готовятся один раз на все направления: первый получатель загружает байты,
+    остальные переиспользуют file_id из его сообщений. У каждого получателя свой отправитель.
+    file_id сохраняются в базе, поэтому повторная отправка той же машины ничего не загружает.
+
+    Для очереди задач: skip — уже отправленные пары (номер машины с 1, номер получателя),
+    on_result — отметка о каждой паре, cancelled — остановка между машинами.
+    Возвращает итоговый статус партии.
     """
-    logger.info(f"🚀 Started batch {batch_id} to '{destination_name}'")
-    
-    # --- ИСПРАВЛЕНИЕ ТАЙМАУТА ---
-    # Создаем сессию с таймаутом 120 секунд (2 минуты)
-    # Это решит проблему "Request timeout error" при отправке 10 фото
-    session = AiohttpSession(timeout=120)
-    bot = Bot(token=settings.BOT_TOKEN, session=session)
-    # ----------------------------
+    names = ", ".join(f"'{d.name}'" for d in destinations)
+    logger.info("🚀 Started batch %s to %s", batch_id, names, batch_id=batch_id)
+    await start_batch(batch_id, [d.name for d in destinations])
+    cancelled = cancelled or asyncio.Event()
+    started_at = time.perf_counter()
+
+    # Что кому осталось отправить. Машины, отправленные всем, даже не готовим
+    plan = []
+    for index, item in enumerate(items, 1):
+        targets = [d for d in range(len(destinations)) if (index, d) not in (skip or ())]
+        if targets:
+            plan.append((index, item, targets))
+    if skip:
+        logger.info("   ⏩ Resuming: %d of %d cars left to send.", len(plan), len(items), batch_id=batch_id)
+    events.publish(
+        "batch", batch_id=batch_id, stage="started", total=len(items), remaining=len(plan),
+        destinations=[d.name for d in destinations]
+    )
     
-    async with httpx.AsyncClient(timeout=15.0) as http_client:
-        for index, item in enumerate(items, 1):
-            try:
-                car_id = item.id
-                car_caption = item.caption
+    # Общий бот приложения (таймаут сессии 120 секунд, см. services/telegram.py)
+    bot = get_bot()
 
-                logger.info(f"Processing car {index}/{len(items)} (ID: {car_id})...")
-                
-                # 1. Ссылки
-                photo_urls = await fetch_car_photos(car_id)
-                if not photo_urls:
-                    logger.warning(f"⚠️ No photos found for car {car_id}")
-                    continue
-                
-                logger.info(f"   📸 Found {len(photo_urls)} photos. Selecting top 10...")
-                target_urls = photo_urls[:10]
-                
-                # 2. Скачивание
-                logger.info(f"   ⬇️ Downloading and resizing...")
-                tasks = [download_and_resize(http_client, url) for url in target_urls]
-                processed_images = await asyncio.gather(*tasks)
-                valid_images = [img for img in processed_images if img is not None]
+    # Ограниченная очередь: подготовка не убегает дальше, чем на PIPELINE_PREFETCH машин
+    queue: asyncio.Queue = asyncio.Queue(maxsize=settings.PIPELINE_PREFETCH)
+    active_pipeline_queues.add(queue)
+    # Очередь каждого получателя тоже ограничена, чтобы медленный чат не копил альбомы в памяти
+    dest_queues = [asyncio.Queue(maxsize=settings.PIPELINE_PREFETCH) for _ in destinations]
+    report = _safe_report(on_result, batch_id) if on_result else _ignore_result
+    
+    # Общий клиент приложения (keep-alive), тот же, что у парсера
+    http_client = get_http_client()
+    producer = asyncio.create_task(_feed_pipeline(queue, plan, len(items), batch_id, http_client, cancelled))
+    senders = [
+        asyncio.create_task(
+            _send_loop(dest_queues[i], bot, len(items), i, dest, batch_id, report, cancelled)
+        )
+        for i, dest in enumerate(destinations)
+    ]
+    status = "failed"
+    try:
+        await _dispatch(queue, dest_queues, batch_id, report, cancelled)
+        await asyncio.gather(*senders)
+        status = "cancelled" if cancelled.is_set() else "done"
+    finally:
+        active_pipeline_queues.discard(queue)
+        producer.cancel()
+        for sender in senders:
+            sender.cancel()
+        # Гасим уже запущенные подготовки, если отправка прервалась
+        while not queue.empty():
+            entry = queue.get_nowait()
+            if entry is not None:
+                entry[2].cancel()
                 
-                if not valid_images:
-                    logger.warning(f"❌ Failed to process images for {car_id}")
-                    continue
+        # Сохраненные сообщения партии сразу видны в истории
+        await flush_db()
+        await finish_batch(batch_id, status)
+        events.publish(
+            "batch", batch_id=batch_id, stage="finished", status=status,
+            ms=round((time.perf_counter() - started_at) * 1000)
+        )
+    logger.info("🏁 Batch processing finished (%s).", status, batch_id=batch_id)
+    return status
+
+
+async def _ignore_result(index: int, dest_index: int, result: str):
+    pass
+
+
+def _safe_report(report: ResultCallback, batch_id: str) -> ResultCallback:
+    """
+    Отметка пары не должна ронять конвейер: если отправитель умрет на ошибке базы,
+    _dispatch навсегда повиснет на put() в его полную очередь, а задача — в running.
+    Неотмеченная пара после рестарта просто уйдет еще раз.
+    """
+    async def report_or_log(index: int, dest_index: int, result: str):
+        try:
+            await report(index, dest_index, result)
+        except Exception as e:
+            logger.error(
+                "Failed to save result of car %d for destination %d: %s", index, dest_index, e, batch_id=batch_id
+            )
+    return report_or_log
+
+
+async def _feed_pipeline(
+    queue: asyncio.Queue,
+    plan: List[Tuple[int, CarRequestItem, List[int]]],
+    total: int,
+    batch_id: str,
+    http_client: "httpx.AsyncClient",
+    cancelled: asyncio.Event
+):
+    """Запускает подготовку машин по порядку. put() блокируется, когда очередь полна."""
+    for index, item, targets in plan:
+        if cancelled.is_set():
+            break
+        task = asyncio.create_task(prepare_car(http_client, item, index, total, batch_id))
+        await queue.put((index, item, task, targets))
+    await queue.put(None)  # Конец партии
+
+
+async def _dispatch(
+    queue: asyncio.Queue,
+    dest_queues: List[asyncio.Queue],
+    batch_id: str,
+    report: ResultCallback,
+    cancelled: asyncio.Event
+):
+    """Забирает подготовленные машины по порядку и раздает их нужным получателям."""
+    while True:
+        entry = await queue.get()
+        if entry is None:
+            break
+        index, item, task, targets = entry
+        if cancelled.is_set():
+            task.cancel()
+            continue
+        photos = await task
+        if not photos:
+            for dest_index in targets:
+                await report(index, dest_index, "failed")
+            continue
+        car = PreparedCar(index, item, photos, targets)
+        for dest_index in targets:
+            await dest_queues[dest_index].put(car)
+    for dest_queue in dest_queues:
+        await dest_queue.put(None)
+
+
+async def prepare_car(
+    http_client: "httpx.AsyncClient",
+    item: CarRequestItem,
+    index: int,
+    total: int,
+    batch_id: str = ""
+) -> List[PreparedPhoto] | None:
+    """
+    Стадия подготовки: ссылки на фото + скачивание и ресайз.
+    Фото, которые уже загружались в Телеграм, не качаем — берем их file_id из базы.
+    """
+    car_id = item.id
+    started_at = time.perf_counter()
+    try:
+        logger.info("Processing car %d/%d (ID: %s)...", index, total, car_id, batch_id=batch_id)
+
+        # 1. Ссылки
+        photo_urls = await fetch_car_photos(car_id)
+        lookup_seconds = time.perf_counter() - started_at
+        _LOOKUP_SECONDS.observe(lookup_seconds)
+        lookup_ms = round(lookup_seconds * 1000)
+        if not photo_urls:
+            logger.warning("⚠️ No photos found for car %s", car_id, batch_id=batch_id)
+            events.publish(
+                "car", batch_id=batch_id, index=index, car_id=car_id, stage="prepare",
+                error="no photos", ms=lookup_ms
+            )
+            return None
+        
+        logger.info("   📸 Found %d photos. Selecting top 10...", len(photo_urls), batch_id=batch_id)
+        target_urls = photo_urls[:10]
+        known_file_ids = await get_file_ids(target_urls)
+        
+        # 2. Скачивание (только того, чего еще нет в Телеграме)
+        to_download = [url for url in target_urls if url not in known_file_ids]
+        if to_download:
+            logger.info("   ⬇️ Downloading and resizing %d photos...", len(to_download), batch_id=batch_id)
+        tasks = [download_and_resize(http_client, url) for url in to_download]
+        downloaded = dict(zip(to_download, await asyncio.gather(*tasks)))
+
+        photos = []
+        for url in target_urls:
+            if url in known_file_ids:
+                photos.append(PreparedPhoto(url, file_id=known_file_ids[url]))
+            elif downloaded.get(url) is not None:
+                photos.append(PreparedPhoto(url, data=downloaded[url]))
+        
+        total_seconds = time.perf_counter() - started_at
+        _PREPARE_SECONDS.observe(total_seconds)
+        total_ms = round(total_seconds * 1000)
+        if not photos:
+            logger.warning("❌ Failed to process images for %s", car_id, batch_id=batch_id)
+            events.publish(
+                "car", batch_id=batch_id, index=index, car_id=car_id, stage="prepare",
+                error="download failed", ms=total_ms
+            )
+            return None
+
+        reused = len(target_urls) - len(to_download)
+        logger.info(
+            "   ✅ Prepared %d images for car %s (%d already in Telegram).",
+            len(photos), car_id, reused, batch_id=batch_id
+        )
+        events.publish(
+            "car", batch_id=batch_id, index=index, total=total, car_id=car_id, stage="prepared",
+            photos=len(photos), reused=reused, lookup_ms=lookup_ms, ms=total_ms
+        )
+        return photos
+    except Exception as e:
+        logger.error("CRITICAL ERROR while preparing car %s: %s", car_id, e, batch_id=batch_id)
+        events.publish("car", batch_id=batch_id, index=index, car_id=car_id, stage="prepare", error=str(e))
+        return None
+
+
+def _upload_size(car: PreparedCar) -> int:
+    """Сколько байт уйдет в Телеграм (фото без file_id)."""
+    return sum(len(photo.data) for photo in car.photos if not photo.file_id and photo.data)
+
+
+def _build_media(car: PreparedCar) -> List["InputMediaPhoto"]:
+    """Альбом: file_id, если фото уже в Телеграме, иначе байты."""
+    from aiogram.types import InputMediaPhoto, BufferedInputFile
+
+    media = []
+    for i, photo in enumerate(car.photos):
+        if photo.file_id:
+            source = photo.file_id
+        else:
+            source = BufferedInputFile(photo.data, filename=f"car_{car.item.id}_{i}.jpg")
+        media.append(InputMediaPhoto(media=source, caption=car.item.caption if i == 0 else None))
+    return media
+
+
+async def _remember_file_ids(car: PreparedCar, messages: List["Message"]):
+    """Запоминает file_id загруженных фото: в альбоме для остальных получателей и в базе."""
+    if len(messages) != len(car.photos):
+        return
+    new_ids = []
+    for photo, message in zip(car.photos, messages):
+        if not message.photo:
+            continue
+        file_id = message.photo[-1].file_id  # Самый большой размер
+        if photo.file_id != file_id:
+            photo.file_id = file_id
+            new_ids.append((photo.url, file_id))
+        # Фото уже в Телеграме, остальные получатели шлют file_id — байты больше не нужны
+        photo.data = None
+    if new_ids:
+        await save_file_ids(new_ids)
 
-                logger.info(f"   ✅ Prepared {len(valid_images)} images.")
 
-                # 3. Альбом
-                media_group = []
-                for i, img_bytes in enumerate(valid_images):
-                    input_file = BufferedInputFile(img_bytes, filename=f"car_{car_id}_{i}.jpg")
-                    caption_text = car_caption if i == 0 else None
-                    media_group.append(InputMediaPhoto(media=input_file, caption=caption_text))
+# Ошибки Bot API, которые означают, что не принят сам file_id (протух, чужой бот, битый)
+_FILE_ID_ERRORS = ("file identifier", "file_id", "file reference", "file_reference")
 
-                # 4. Отправка
-                logger.info(f"   📤 Sending album to '{destination_name}'...")
+
+def _is_file_id_error(error: Exception) -> bool:
+    """
+    Только такие ошибки лечатся перезагрузкой фото. "chat not found", длинная подпись
+    и прочее — не про file_id: перекачка не поможет, а сотрет file_id общего альбома.
+    """
+    message = (getattr(error, "message", None) or str(error)).lower()
+    return any(marker in message for marker in _FILE_ID_ERRORS)
+
+
+async def _reload_photos(car: PreparedCar) -> bool:
+    """
+    Телеграм не принял сохраненные file_id (протухли или бот сменился).
+    Забываем их и докачиваем байты. Возвращает False, если скачать ничего не удалось.
+    """
+    stale = [photo for photo in car.photos if photo.file_id and photo.data is None]
+    if not stale:
+        return False
+    await delete_file_ids([photo.url for photo in stale])
+    http_client = get_http_client()
+    results = await asyncio.gather(*(download_and_resize(http_client, photo.url) for photo in stale))
+    for photo, data in zip(stale, results):
+        photo.file_id = None
+        photo.data = data
+    car.photos = [photo for photo in car.photos if photo.file_id or photo.data is not None]
+    return bool(car.photos)
+
+
+async def _send_loop(
+    queue: asyncio.Queue,
+    bot: "Bot",
+    total: int,
+    dest_index: int,
+    destination: Destination,
+    batch_id: str,
+    report: ResultCallback,
+    cancelled: asyncio.Event
+):
+    """
+    Стадия отправки для одного получателя: забирает готовые альбомы по порядку,
+    темп держит общий лимитер Телеграма. Загружает байты только первый получатель
+    машины (uploader), остальные ждут его file_id.
+    """
+    from aiogram.exceptions import TelegramBadRequest
+
+    while True:
+        car = await queue.get()
+        if car is None:
+            break
+        is_uploader = car.uploader == dest_index
+        result = "failed"
+        try:
+            # Отмена: уже подготовленное не отправляем, задача остается pending
+            if cancelled.is_set():
+                result = None
+                continue
+
+            # 3. Альбом
+            if not is_uploader:
+                await car.uploaded.wait()
+            media_group = _build_media(car)
+            upload_bytes = _upload_size(car)
+            send_started_at = time.perf_counter()
+
+            # 4. Отправка
+            logger.info(
+                "   📤 Sending album %d/%d to '%s'...", car.index, total, destination.name, batch_id=batch_id
+            )
+            try:
                 sent_messages = await send_with_retry(
                     bot, 
-                    target_chat_id, 
+                    destination.chat_id, 
                     media_group, 
-                    message_thread_id
+                    destination.message_thread_id
                 )
-                
-                # 5. Сохранение
-                if sent_messages:
-                    msg_ids = [m.message_id for m in sent_messages]
-                    await save_message_ids(batch_id, target_chat_id, msg_ids, destination_name)
-
-                logger.info(f"🎉 Car {car_id} DONE.")
-                # Пауза, чтобы не забивать канал
-                await asyncio.sleep(2)
-
-            except Exception as e:
-                logger.error(f"CRITICAL ERROR on car {item.id}: {e}")
-                import traceback
-                traceback.print_exc()
-                
-    await bot.session.close()
-    logger.info("🏁 Batch processing finished.")
+            except TelegramBadRequest as e:
+                # Недействительный file_id — перекачиваем фото и шлем байтами.
+                # Остальные ошибки запроса отдаем наверх, общий альбом не трогаем
+                if not _is_file_id_error(e) or not await _reload_photos(car):
+                    raise
+                logger.warning(
+                    "   ♻️ Stored file_ids rejected (%s), re-uploading car %s...", e, car.item.id, batch_id=batch_id
+                )
+                upload_bytes = _upload_size(car)
+                sent_messages = await send_with_retry(
+                    bot, 
+                    destination.chat_id, 
+                    _build_media(car), 
+                    destination.message_thread_id
+                )
+            # Альбом с байтами больше не нужен, не держим его до следующей машины
+            media_group = None
+            send_seconds = time.perf_counter() - send_started_at
+            _SEND_SECONDS.observe(send_seconds)
+            
+            # 5. Сохранение
+            if sent_messages:
+                await _remember_file_ids(car, sent_messages)
+                msg_ids = [m.message_id for m in sent_messages]
+                await save_message_ids(batch_id, destination.chat_id, msg_ids, destination.name)
+                result = "done"
+                UPLOADED_BYTES.inc(upload_bytes)
+
+            logger.info("🎉 Car %s DONE for '%s'.", car.item.id, destination.name, batch_id=batch_id)
+            events.publish(
+                "car", batch_id=batch_id, index=car.index, total=total, car_id=car.item.id,
+                stage="sent" if result == "done" else "send", destination=destination.name,
+                ms=round(send_seconds * 1000),
+                error=None if result == "done" else "no messages returned"
+            )
+
+        except asyncio.CancelledError:
+            # Остановка сервера посреди отправки: не отмечаем, после рестарта пара останется pending
+            result = None
+            raise
+        except Exception as e:
+            logger.error(
+                "CRITICAL ERROR on car %s ('%s'): %s", car.item.id, destination.name, e, batch_id=batch_id
+            )
+            events.publish(
+                "car", batch_id=batch_id, index=car.index, car_id=car.item.id, stage="send",
+                destination=destination.name, error=str(e)
+            )
+            import traceback
+            traceback.print_exc()
+        finally:
+            if is_uploader:
+                # Даже при ошибке отпускаем остальных — они загрузят байты сами
+                car.uploaded.set()
+            car.release()
+            if result:
+                (_ALBUMS_DONE if result == "done" else _ALBUMS_FAILED).inc()
+                await report(car.index, dest_index, result)
 
 
-async def download_and_resize(client: httpx.AsyncClient, url: str) -> bytes | None:
+async def download_and_resize(client: "httpx.AsyncClient", url: str) -> bytes | None:
     try:
-        resp = await client.get(url)
-        if resp.status_code != 200: return None
+        # Готовый JPEG уже есть на диске — ни сети, ни Pillow
+        cache_key = image_cache.key_for(url, RESIZE_SIGNATURE)
+        cached = await image_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        with _DOWNLOAD_SECONDS.time():
+            data = await _download_limited(client, url, int(settings.IMAGE_MAX_DOWNLOAD_MB * 1024 * 1024))
+        if data is None:
+            DOWNLOAD_FAILURES.inc()
+            return None
         
-        img_buffer = BytesIO(resp.content)
-        with Image.open(img_buffer) as img:
-            img = img.convert("RGB")
-            img.thumbnail((1600, 1600))
-            output = BytesIO()
-            img.save(output, format="JPEG", quality=85, optimize=True)
-            return output.getvalue()
+        # Декод/ресайз/кодирование уходят в пул, event loop не блокируется.
+        # Сколько картинок декодируется одновременно, ограничивает бюджет памяти
+        with _RESIZE_SECONDS.time():
+            result = await resize_image_async(data)
+        del data
+        await image_cache.put(cache_key, result)
+        return result
     except Exception:
+        DOWNLOAD_FAILURES.inc()
         return None
 
+
+async def _download_limited(client: "httpx.AsyncClient", url: str, max_bytes: int) -> bytearray | None:
+    """Качает потоком и бросает файл, как только он перерос max_bytes."""
+    async with client.stream("GET", url, timeout=15.0) as resp:
+        if resp.status_code != 200:
+            return None
+        length = resp.headers.get("content-length")
+        if length and length.isdigit() and int(length) > max_bytes:
+            logger.warning("Photo %s is too large (%s bytes), skipping.", url, length)
+            return None
+        buffer = bytearray()
+        async for chunk in resp.aiter_bytes():
+            buffer += chunk
+            if len(buffer) > max_bytes:
+                logger.warning("Photo %s is larger than %d bytes, skipping.", url, max_bytes)
+                return None
+        return buffer
+
 async def send_with_retry(
-    bot: Bot, 
+    bot: "Bot", 
     chat_id: int, 
-    media: List[InputMediaPhoto], 
+    media: List["InputMediaPhoto"], 
     message_thread_id: Optional[int]
-) -> List[Message]:
+) -> List["Message"]:
+    """Отправка альбома. Паузы и RetryAfter — на лимитере, здесь только сетевые повторы."""
+    from aiogram.exceptions import TelegramNetworkError, TelegramBadRequest
+
     max_retries = 3
     for attempt in range(max_retries):
         try:
-            msgs = await bot.send_media_group(
-                chat_id=chat_id, 
-                media=media, 
-                message_thread_id=message_thread_id,
-                request_timeout=120 # Дублируем таймаут для надежности
+            msgs = await telegram_limiter.call(
+                chat_id,
+                lambda: bot.send_media_group(
+                    chat_id=chat_id, 
+                    media=media, 
+                    message_thread_id=message_thread_id,
+                    request_timeout=120 # Дублируем таймаут для надежности
+                )
             )
             return msgs
-        except TelegramRetryAfter as e:
-            wait_time = e.retry_after
-            logger.warning(f"Telegram Flood Limit! Sleeping for {wait_time}s...")
-            await asyncio.sleep(wait_time)
+        except TelegramBadRequest:
+            # Ошибка в самом запросе (например, битый file_id) — повтор не поможет
+            raise
         except TelegramNetworkError as e:
              # Ловим проблемы с сетью отдельно
-            logger.warning(f"Network error (attempt {attempt+1}/{max_retries}): {e}. Retrying...")
+            logger.warning("Network error (attempt %d/%d): %s. Retrying...", attempt + 1, max_retries, e)
             await asyncio.sleep(5)
         except Exception as e:
-            logger.error(f"Telegram API Error: {e}")
+            logger.error("Telegram API Error: %s", e)
             # Если это не последний раз, пробуем еще
             if attempt < max_retries - 1:
-                logger.warning(f"Retrying... ({attempt+1})")
+                logger.warning("Retrying... (%d)", attempt + 1)
                 await asyncio.sleep(3)
             else:
                 raise e
-    return []
\ No newline at end of file
+    return []
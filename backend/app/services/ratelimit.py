@@ -0,0 +1,206 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, TypeVar
+
+from ..config import settings
+from .logger import logger
+from .metrics import RETRY_AFTER
+from .state import LocalState, state
+
+T = TypeVar("T")
+
+# Во сколько раз урезаем скорость после RetryAfter и на какую долю базовой
+# скорости возвращаемся после каждого успешного запроса
+DECREASE_FACTOR = 0.5
+RECOVERY_STEP = 0.05
+MIN_RATE_FACTOR = 0.1
+
+
+class TokenBucket:
+    """
+    Токен-бакет с резервированием: acquire уходит в минус и возвращает,
+    сколько ждать. Так очередь ожидающих обслуживается по порядку.
+    Часы передаются снаружи — чтобы проверять без реального времени.
+    """
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        self.base_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated = clock()
+        self.blocked_until = 0.0
+
+    @classmethod
+    def restore(cls, rate: float, capacity: float, row: tuple | None, clock: Callable[[], float]) -> "TokenBucket":
+        """Бакет из сохраненной строки (tokens, rate, updated, blocked_until); None — новый, полный."""
+        bucket = cls(rate, capacity, clock)
+        if row is not None:
+            bucket.tokens, bucket.rate, bucket.updated, bucket.blocked_until = row
+            # Базовую скорость могли уменьшить в настройках
+            bucket.rate = min(bucket.rate, rate)
+        return bucket
+
+    def dump(self) -> tuple:
+        return (self.tokens, self.rate, self.updated, self.blocked_until)
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def reserve(self, cost: float = 1.0) -> float:
+        """Забирает cost токенов и возвращает задержку (сек) до их наличия."""
+        now = self.clock()
+        self._refill(now)
+        self.tokens -= cost
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(wait, self.blocked_until - now)
+
+    def penalize(self, retry_after: float):
+        """Телеграм сказал подождать: стоим retry_after и дальше едем медленнее."""
+        now = self.clock()
+        self._refill(now)
+        self.rate = max(self.base_rate * MIN_RATE_FACTOR, self.rate * DECREASE_FACTOR)
+        self.tokens = min(self.tokens, 0.0)
+        self.blocked_until = max(self.blocked_until, now + retry_after)
+
+    def slow_down(self):
+        """Притормозить без паузы."""
+        self.rate = max(self.base_rate * MIN_RATE_FACTOR, self.rate * DECREASE_FACTOR)
+
+    def reward(self):
+        """Успешный запрос: понемногу возвращаем скорость к базовой."""
+        if self.rate < self.base_rate:
+            self._refill(self.clock())
+            self.rate = min(self.base_rate, self.rate + self.base_rate * RECOVERY_STEP)
+
+
+class TelegramRateLimiter:
+    """
+    Общий лимитер для всех вызовов Bot API: глобальный бакет на бота
+    и отдельный бакет на каждый чат (у групп/каналов лимит строже).
+    Удаления (kind="delete") идут через свой бакет чата: у них нет лимита 20/мин
+    на группу, и очистка не должна отнимать темп у отправки в тот же чат.
+    Сами бакеты лежат в state: в памяти процесса или в общей базе,
+    если воркеров несколько — тогда лимиты Телеграма держатся на всех сразу.
+    """
+
+    def __init__(
+        self,
+        global_rate: float,
+        private_rate: float,
+        group_rate: float,
+        burst: float = 3.0,
+        delete_rate: float = 10.0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+        max_retry_after: int = 5,
+        state: LocalState | None = None,
+    ):
+        self.global_rate = global_rate
+        self.private_rate = private_rate
+        self.group_rate = group_rate
+        self.burst = burst
+        self.delete_rate = delete_rate
+        self.clock = clock
+        self.sleep = sleep
+        self.max_retry_after = max_retry_after
+        self.state = state or LocalState()
+        # Успешные запросы по чатам, еще не зачтенные бакетам: применяются
+        # в следующем acquire, чтобы не делать отдельную запись на каждый успех
+        self._rewards: dict[tuple[str, int], int] = {}
+        self.retry_after_hits = 0
+
+    @classmethod
+    def from_settings(cls) -> "TelegramRateLimiter":
+        return cls(
+            global_rate=settings.TG_GLOBAL_RATE,
+            private_rate=settings.TG_PRIVATE_CHAT_RATE,
+            group_rate=settings.TG_GROUP_RATE_PER_MIN / 60.0,
+            burst=settings.TG_CHAT_BURST,
+            delete_rate=settings.TG_DELETE_RATE,
+            # Общие бакеты сравнивают время разных процессов — нужны настенные часы
+            clock=time.time if state.shared else time.monotonic,
+            state=state,
+        )
+
+    def _chat_bucket_spec(self, chat_id: int, kind: str) -> tuple[str, float, float]:
+        """(ключ, скорость, емкость) бакета чата для вида запросов."""
+        if kind == "delete":
+            return f"delete:{chat_id}", self.delete_rate, self.delete_rate
+        # Отрицательный id — группа или канал
+        chat_rate = self.group_rate if chat_id < 0 else self.private_rate
+        return f"chat:{chat_id}", chat_rate, self.burst
+
+    async def _update(self, chat_id: int, kind: str, op: Callable[[TokenBucket, TokenBucket], T]) -> T:
+        """op(глобальный бакет, бакет чата) — одной транзакцией над состоянием."""
+        chat_key, chat_rate, chat_capacity = self._chat_bucket_spec(chat_id, kind)
+        specs = {"global": (self.global_rate, self.global_rate), chat_key: (chat_rate, chat_capacity)}
+        now = self.clock()
+
+        def apply(rows):
+            buckets = [
+                TokenBucket.restore(rate, capacity, rows.get(key), lambda: now)
+                for key, (rate, capacity) in specs.items()
+            ]
+            return op(*buckets), {key: bucket.dump() for key, bucket in zip(specs, buckets)}
+
+        return await self.state.bucket_transaction(list(specs), apply)
+
+    async def acquire(self, chat_id: int, cost: float = 1.0, kind: str = "send"):
+        rewards = self._rewards.pop((kind, chat_id), 0)
+
+        def reserve(global_bucket: TokenBucket, chat_bucket: TokenBucket) -> float:
+            for _ in range(rewards):
+                chat_bucket.reward()
+                global_bucket.reward()
+            return max(global_bucket.reserve(cost), chat_bucket.reserve(cost))
+
+        wait = await self._update(chat_id, kind, reserve)
+        if wait > 0:
+            await self.sleep(wait)
+
+    async def on_retry_after(self, chat_id: int, retry_after: float, kind: str = "send"):
+        self.retry_after_hits += 1
+        RETRY_AFTER.inc()
+
+        def penalize(global_bucket: TokenBucket, chat_bucket: TokenBucket):
+            chat_bucket.penalize(retry_after)
+            # Глобальный бакет только притормаживаем, не блокируем — другие чаты пусть едут
+            global_bucket.slow_down()
+
+        await self._update(chat_id, kind, penalize)
+
+    def on_success(self, chat_id: int, kind: str = "send"):
+        key = (kind, chat_id)
+        self._rewards[key] = self._rewards.get(key, 0) + 1
+
+    async def call(
+        self, chat_id: int, func: Callable[[], Awaitable[T]], cost: float = 1.0, kind: str = "send"
+    ) -> T:
+        """
+        Выполняет вызов Bot API под лимитером. На RetryAfter ждет и повторяет
+        (не больше max_retry_after раз), остальные ошибки отдает наверх.
+        kind — "send" или "delete" (свой бакет чата, см. описание класса).
+        """
+        from aiogram.exceptions import TelegramRetryAfter
+
+        for attempt in range(self.max_retry_after + 1):
+            await self.acquire(chat_id, cost, kind)
+            try:
+                result = await func()
+            except TelegramRetryAfter as e:
+                if attempt >= self.max_retry_after:
+                    raise
+                logger.warning(f"Telegram Flood Limit in chat {chat_id}! Backing off for {e.retry_after}s...")
+                await self.on_retry_after(chat_id, e.retry_after, kind)
+                continue
+            self.on_success(chat_id, kind)
+            return result
+        raise RuntimeError("unreachable")
+
+
+telegram_limiter = TelegramRateLimiter.from_settings()
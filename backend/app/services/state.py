@@ -0,0 +1,227 @@
+import asyncio
+import os
+import socket
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import aiosqlite
+
+from ..config import settings
+from .logger import logger, LogRecord
+from .events import Message, events
+
+# Имя процесса в общей базе: за кем числится партия или аренда
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+# Строка бакета лимитера: (tokens, rate, updated, blocked_until)
+BucketRow = Tuple[float, float, float, float]
+BucketFn = Callable[[Dict[str, Optional[BucketRow]]], Tuple[Any, Dict[str, BucketRow]]]
+
+
+class LocalState:
+    """
+    Состояние одного процесса: бакеты лимитера в памяти,
+    логи и события живут в MemoryLogger/EventBus. Так было всегда, пока воркер один.
+    """
+
+    shared = False
+
+    def __init__(self):
+        self._buckets: Dict[str, BucketRow] = {}
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def bucket_transaction(self, keys: List[str], fn: BucketFn) -> Any:
+        # Без await внутри — в пределах event loop это и так атомарно
+        result, rows = fn({key: self._buckets.get(key) for key in keys})
+        self._buckets.update(rows)
+        return result
+
+    async def recent_logs(self, batch_id: str | None = None) -> List[str]:
+        return logger.get_recent_logs(batch_id)
+
+
+class SqliteState(LocalState):
+    """
+    Общее состояние нескольких воркеров uvicorn в отдельном SQLite-файле (WAL).
+    Оно одноразовое: бакеты, хвост логов и события — терять при рестарте не жалко,
+    поэтому без миграций и отдельно от history.db (там отложенные коммиты держат запись).
+
+    - Бакеты лимитера меняются в BEGIN IMMEDIATE: лимиты Телеграма общие на все процессы.
+    - Логи и события копятся в памяти и пишутся пачкой раз в FLUSH_INTERVAL.
+    - Каждый воркер читает новые события из таблицы и раздает своим SSE-подписчикам.
+    """
+
+    shared = True
+
+    FLUSH_INTERVAL = 0.2
+    RELAY_INTERVAL = 0.25
+    # Сколько строк держать в таблицах (хвост для /api/logs и запас для отставших воркеров)
+    KEEP_LOGS = 5000
+    KEEP_EVENTS = 2000
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self._db: aiosqlite.Connection | None = None
+        self._lock = asyncio.Lock()
+        # Записи и события копятся как есть, текст собирается при записи в базу (в _flush)
+        self._log_outbox: List[LogRecord] = []
+        self._event_outbox: List[Message] = []
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        # isolation_level=None — транзакции открываем сами (BEGIN IMMEDIATE)
+        self._db = await aiosqlite.connect(self.path, isolation_level=None)
+        await self._db.execute("PRAGMA journal_mode=WAL")
+        await self._db.execute("PRAGMA synchronous=OFF")
+        await self._db.execute("PRAGMA busy_timeout=5000")
+        async with self._transaction():
+            await self._db.execute(
+                "CREATE TABLE IF NOT EXISTS rate_buckets ("
+                "key TEXT PRIMARY KEY, tokens REAL, rate REAL, updated REAL, blocked_until REAL)"
+            )
+            await self._db.execute(
+                "CREATE TABLE IF NOT EXISTS logs ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, batch_id TEXT, text TEXT NOT NULL)"
+            )
+            await self._db.execute("CREATE INDEX IF NOT EXISTS idx_logs_batch ON logs (batch_id, id)")
+            await self._db.execute(
+                "CREATE TABLE IF NOT EXISTS events (id INTEGER PRIMARY KEY AUTOINCREMENT, message TEXT NOT NULL)"
+            )
+        cursor = await self._db.execute("SELECT COALESCE(MAX(id), 0) FROM events")
+        (last_event,) = await cursor.fetchone()
+
+        # Логи и события этого процесса теперь уходят в общую базу
+        logger.sink = self._add_log
+        events.forward = self._add_event
+        self._tasks = [
+            asyncio.create_task(self._flush_loop()),
+            asyncio.create_task(self._relay_loop(last_event)),
+        ]
+        logger.info("🧩 Shared state at %s (worker %s)", self.path, WORKER_ID)
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.sink = None
+        events.forward = None
+        if self._db is not None:
+            await self._flush()
+            await self._db.close()
+            self._db = None
+
+    @asynccontextmanager
+    async def _transaction(self):
+        """BEGIN IMMEDIATE ... COMMIT: блокировка записи берется сразу, по одной транзакции за раз."""
+        async with self._lock:
+            await self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                await self._db.execute("ROLLBACK")
+                raise
+            await self._db.execute("COMMIT")
+
+    # --- Лимитер ---
+
+    async def bucket_transaction(self, keys: List[str], fn: BucketFn) -> Any:
+        async with self._transaction():
+            rows = {}
+            for key in keys:
+                cursor = await self._db.execute(
+                    "SELECT tokens, rate, updated, blocked_until FROM rate_buckets WHERE key = ?", (key,)
+                )
+                rows[key] = await cursor.fetchone()
+            result, new_rows = fn(rows)
+            await self._db.executemany(
+                "INSERT OR REPLACE INTO rate_buckets (key, tokens, rate, updated, blocked_until) VALUES (?, ?, ?, ?, ?)",
+                [(key, *row) for key, row in new_rows.items()]
+            )
+        return result
+
+    # --- Логи и события ---
+
+    # Не list.append напрямую: _flush подменяет списки, привязанный append писал бы в старый
+    def _add_log(self, record: LogRecord):
+        self._log_outbox.append(record)
+
+    def _add_event(self, message: Message):
+        self._event_outbox.append(message)
+
+    async def recent_logs(self, batch_id: str | None = None) -> List[str]:
+        await self._flush()
+        if batch_id is not None:
+            cursor = await self._db.execute(
+                "SELECT text FROM logs WHERE batch_id = ? ORDER BY id DESC LIMIT ?",
+                (batch_id, logger.batch_max_len)
+            )
+        else:
+            cursor = await self._db.execute(
+                "SELECT text FROM logs ORDER BY id DESC LIMIT ?", (logger.logs.maxlen,)
+            )
+        return [row[0] for row in reversed(await cursor.fetchall())]
+
+    async def _flush(self):
+        if not self._log_outbox and not self._event_outbox:
+            return
+        logs, self._log_outbox = self._log_outbox, []
+        messages, self._event_outbox = self._event_outbox, []
+        async with self._transaction():
+            if logs:
+                await self._db.executemany(
+                    "INSERT INTO logs (batch_id, text) VALUES (?, ?)",
+                    [(record.batch_id, record.format()) for record in logs]
+                )
+            if messages:
+                await self._db.executemany(
+                    "INSERT INTO events (message) VALUES (?)", [(str(message),) for message in messages]
+                )
+
+    async def _flush_loop(self):
+        flushes = 0
+        while True:
+            await asyncio.sleep(self.FLUSH_INTERVAL)
+            try:
+                await self._flush()
+                flushes += 1
+                if flushes % 100 == 0:
+                    async with self._transaction():
+                        await self._db.execute(
+                            "DELETE FROM logs WHERE id <= (SELECT MAX(id) FROM logs) - ?", (self.KEEP_LOGS,)
+                        )
+                        await self._db.execute(
+                            "DELETE FROM events WHERE id <= (SELECT MAX(id) FROM events) - ?", (self.KEEP_EVENTS,)
+                        )
+            except Exception as e:
+                logger.warning("Shared state flush failed: %s", e)
+
+    async def _relay_loop(self, last_id: int):
+        """Новые события всех воркеров -> SSE-подписчики этого процесса."""
+        while True:
+            await asyncio.sleep(self.RELAY_INTERVAL)
+            try:
+                cursor = await self._db.execute(
+                    "SELECT id, message FROM events WHERE id > ? ORDER BY id LIMIT 1000", (last_id,)
+                )
+                for event_id, message in await cursor.fetchall():
+                    last_id = event_id
+                    events.fan_out(message)
+            except Exception as e:
+                logger.warning("Shared state relay failed: %s", e)
+
+
+def create_state() -> LocalState:
+    if settings.STATE_BACKEND == "sqlite":
+        return SqliteState(settings.STATE_DB)
+    return LocalState()
+
+
+state = create_state()
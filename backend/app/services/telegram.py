@@ -0,0 +1,51 @@
+from typing import TYPE_CHECKING
+
+from ..config import settings
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+
+# Общий бот приложения: одна aiohttp-сессия с keep-alive к Bot API на все партии и очистки
+_bot: "Bot | None" = None
+
+
+def create_bot(timeout: float | None = None) -> "Bot":
+    """
+    Бот с отдельной сессией. Если задан TELEGRAM_API_URL (свой Bot API сервер
+    или заглушка из бенчмарка) — ходим туда, а не в api.telegram.org.
+    Сессию закрывает вызывающий: await bot.session.close().
+    """
+    # aiogram тяжелый (сотни моделей pydantic) — грузим, только когда нужен бот
+    from aiogram import Bot
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+
+    session_kwargs = {}
+    if timeout is not None:
+        session_kwargs["timeout"] = timeout
+    if settings.TELEGRAM_API_URL:
+        session_kwargs["api"] = TelegramAPIServer.from_base(settings.TELEGRAM_API_URL)
+    return Bot(token=settings.BOT_TOKEN, session=AiohttpSession(**session_kwargs))
+
+
+async def init_bot() -> "Bot":
+    """Создается в lifespan: aiogram импортирован и сессия открыта до первой партии."""
+    bot = get_bot()
+    await bot.session.create_session()
+    return bot
+
+
+def get_bot() -> "Bot":
+    """Общий бот. Если lifespan не запускался (скрипты), создаем на лету."""
+    global _bot
+    if _bot is None:
+        # 120 секунд: альбом из 10 фото иначе ловит "Request timeout error"
+        _bot = create_bot(timeout=120)
+    return _bot
+
+
+async def close_bot():
+    global _bot
+    if _bot is not None:
+        await _bot.session.close()
+        _bot = None
@@ -0,0 +1,187 @@
+import asyncio
+import hashlib
+import time
+from typing import List
+
+from ..config import settings
+from ..models import CarItem, CarRequestItem, Destination
+from ..database import get_auction_snapshot, save_auction_snapshot, try_acquire_lease, release_lease
+from .parser import fetch_auction_list, auction_cache
+from .jobs import job_queue
+from .logger import logger
+from .events import events
+from .state import WORKER_ID
+
+
+def car_caption(car: CarItem) -> str:
+    """Подпись альбома — та же, что собирает фронт (generateCaption)."""
+    return f"🆔 {car.paucXhbtNo}   🚘 {car.carEnNm} ({car.carYtiw})"
+
+
+def snapshot_hash(car: CarItem) -> str:
+    """Короткий хэш полей, изменение которых стоит повторной отправки."""
+    raw = f"{car.trvlDist}|{car.grade}|{car.carYtiw}"
+    return hashlib.blake2b(raw.encode(), digest_size=8).hexdigest()
+
+
+def resolve_destinations(chat_ids: List[int] | None) -> List[Destination]:
+    """Получатели из DESTINATIONS_JSON по chat id (None — все)."""
+    result = []
+    for d in settings.destinations:
+        if chat_ids is None or d["id"] in chat_ids:
+            result.append(Destination(
+                chat_id=d["id"], message_thread_id=d.get("message_thread_id"), name=d.get("name", str(d["id"]))
+            ))
+    return result
+
+
+class AuctionWatcher:
+    """
+    Периодически перечитывает аукционы из WATCH_AUCTIONS_JSON и сравнивает со слепком в базе.
+    В очередь отправки уходят только новые машины и те, у которых поменялся пробег, оценка или год.
+
+    Воркеров uvicorn может быть несколько, аренды лежат в history.db:
+    - "watcher" — кто опрашивает по таймеру;
+    - "watch:<sche_id>" — кто сейчас сверяет аукцион со слепком. Чтение слепка, постановка
+      в очередь и запись слепка идут под ней, поэтому ручной запуск на другом воркере
+      не поставит те же машины второй раз.
+    """
+
+    # Сверка со слепком — пара запросов к базе и постановка в очередь, две минуты с большим запасом
+    CHECK_LEASE = 120.0
+
+    def __init__(self, interval: float, owner: str = WORKER_ID):
+        self.interval = interval
+        # От чьего имени берутся аренды (у каждого процесса свой)
+        self.owner = owner
+        self._task: asyncio.Task | None = None
+        # Ручной запуск и таймер этого воркера не опрашивают одновременно (между воркерами — аренды)
+        self._lock = asyncio.Lock()
+        self.last_run: float | None = None
+        # Держит ли этот воркер аренду опроса (при одном воркере — всегда да)
+        self.leader = False
+        self.last_results: list[dict] = []
+
+    async def start(self):
+        if not settings.watch_auctions:
+            return
+        logger.info("👀 Watching %d auction(s) every %.0fs", len(settings.watch_auctions), self.interval)
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.leader:
+            # Отдаем таймер сразу, не ждем, пока аренда истечет
+            try:
+                await release_lease("watcher", self.owner)
+            except Exception as e:
+                logger.warning("Watcher lease release failed: %s", e)
+            self.leader = False
+
+    def status(self) -> dict:
+        return {
+            "enabled": self._task is not None,
+            "interval": self.interval,
+            "leader": self.leader,
+            "auctions": settings.watch_auctions,
+            "last_run": self.last_run,
+            "last_results": self.last_results,
+        }
+
+    async def _loop(self):
+        while True:
+            # Воркеров несколько — по таймеру опрашивает только держатель аренды.
+            # Он продлевает ее каждый круг; умер — через два интервала аренду возьмет другой
+            try:
+                self.leader = await try_acquire_lease("watcher", self.owner, self.interval * 2)
+            except Exception as e:
+                logger.warning("Watcher lease check failed: %s", e)
+                self.leader = False
+            if self.leader:
+                await self.run_once()
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self) -> list[dict]:
+        """Один опрос всех аукционов. Ошибка в одном не мешает остальным."""
+        async with self._lock:
+            results = []
+            for auction in settings.watch_auctions:
+                sche_id = str(auction["sche_id"]).strip()
+                try:
+                    results.append(await self.check_auction(sche_id, resolve_destinations(auction.get("destinations"))))
+                except Exception as e:
+                    logger.error("Watcher failed on auction %s: %s", sche_id, e)
+                    results.append({"sche_id": sche_id, "error": str(e)})
+            self.last_run = time.time()
+            self.last_results = results
+            return results
+
+    async def check_auction(self, sche_id: str, destinations: List[Destination]) -> dict:
+        # Свежий список, а не кэш превью
+        auction_cache.invalidate(sche_id)
+        cars = await fetch_auction_list(sche_id)
+        if not cars:
+            # Пустой ответ — скорее сбой API, чем пустой аукцион. Слепок не трогаем
+            return {"sche_id": sche_id, "error": "empty list"}
+        if not cars.complete:
+            # Часть страниц не пришла: "пропавшие" машины на самом деле на месте, а после
+            # удаления из слепка ушли бы повторно. Ждем полного списка на следующем опросе
+            logger.warning("👀 Auction %s: incomplete list (%d cars), skipping this poll", sche_id, len(cars))
+            return {"sche_id": sche_id, "error": "incomplete list"}
+
+        # Сверку со слепком делает один воркер за раз. Занято — другой воркер как раз
+        # сверяет тот же аукцион, его результат и будет итогом опроса
+        lease = f"watch:{sche_id}"
+        if not await try_acquire_lease(lease, self.owner, self.CHECK_LEASE):
+            logger.info("👀 Auction %s is being checked by another worker, skipping", sche_id)
+            return {"sche_id": sche_id, "error": "busy"}
+        try:
+            return await self._apply_diff(sche_id, cars, destinations)
+        finally:
+            await release_lease(lease, self.owner)
+
+    async def _apply_diff(self, sche_id: str, cars: List[CarItem], destinations: List[Destination]) -> dict:
+        """Сравнение со слепком, постановка в очередь и новый слепок. Только под арендой аукциона."""
+        known = await get_auction_snapshot(sche_id)
+        first_run = not known
+        rows = []
+        changed: List[CarItem] = []
+        new_count = 0
+        for car in cars:
+            digest = snapshot_hash(car)
+            old = known.pop(car.uscrId, None)
+            if old == digest:
+                continue
+            if old is None:
+                new_count += 1
+            rows.append((car.uscrId, digest, car.trvlDist, car.grade, car.carYtiw))
+            changed.append(car)
+        # Что осталось в known — пропало с аукциона
+        removed = list(known)
+
+        job_id = None
+        if changed and destinations and (not first_run or settings.WATCH_POST_INITIAL):
+            job_id = f"watch-{sche_id}-{int(time.time() * 1000)}"
+            items = [CarRequestItem(id=car.uscrId, caption=car_caption(car)) for car in changed]
+            await job_queue.submit(items, destinations, job_id)
+        # Слепок — только после постановки в очередь: при сбое машины уйдут в следующий раз
+        await save_auction_snapshot(sche_id, rows, removed)
+
+        result = {
+            "sche_id": sche_id, "total": len(cars), "new": new_count,
+            "changed": len(changed) - new_count, "removed": len(removed),
+            "baseline": first_run and job_id is None, "job_id": job_id,
+        }
+        if changed or removed:
+            logger.info(
+                "👀 Auction %s: %d new, %d changed, %d removed -> %s",
+                sche_id, new_count, len(changed) - new_count, len(removed), job_id or "snapshot only"
+            )
+        events.publish("watch", **result)
+        return result
+
+
+watcher = AuctionWatcher(settings.WATCH_INTERVAL)
@@ -0,0 +1,119 @@
+"""
+Сборка и сериализация списка авто для /api/auction/preview: строк в секунду.
+
+Запуск из папки backend:
+    python -m benchmarks.car_list --rows 5000 --repeat 5
+
+old — как было: CarItem(...) на каждую строку, потом FastAPI прогоняет список
+через response_model (повторная валидация + jsonable_encoder + json.dumps).
+new — как сейчас: одна validate_python на весь список и dump_json в байты.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from typing import List
+
+os.environ.setdefault("ADMIN_PASSWORD", "bench")
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+
+from app.models import CarItem, car_list_adapter  # noqa: E402
+from app.services.parser import DETAIL_URL_PREFIX, DETAIL_URL_TEMPLATE, _build_row  # noqa: E402
+
+SCHE_ID = "BENCH"
+
+
+def make_rows(count: int) -> list[dict]:
+    """Строки в том виде, в каком их отдает API списка."""
+    return [
+        {
+            "uscrId": f"BENCH{i:06d}",
+            "uscrPaucScheId": SCHE_ID,
+            "paucXhbtNo": str(1000 + i),
+            "carNo": f"{i:02d}가{i:04d}",
+            "carEnNm": f"Bench Car {i}",
+            "carYtiw": str(2015 + i % 10),
+            "vino": f"VIN{i:014d}",
+            "trvlDist": 10000 + i * 37,
+            "aprGrad": "A",
+            # Лишние поля, которые API тоже присылает
+            "carNm": f"벤치 {i}",
+            "bidYn": "N",
+        }
+        for i in range(count)
+    ]
+
+
+def build_old(rows: list[dict]) -> List[CarItem]:
+    items = []
+    for item in rows:
+        c_id = item["uscrId"]
+        items.append(CarItem(
+            uscrId=c_id,
+            uscrPaucScheId=item.get("uscrPaucScheId", SCHE_ID),
+            paucXhbtNo=item.get("paucXhbtNo", "Unknown"),
+            carNo=item.get("carNo", ""),
+            carEnNm=item.get("carEnNm") or item.get("carNm", "No Name"),
+            carYtiw=item.get("carYtiw", ""),
+            vino=item.get("vino", ""),
+            link=DETAIL_URL_TEMPLATE.format(sche_id=SCHE_ID, car_id=c_id),
+            trvlDist=item.get("trvlDist", 0),
+            grade=item.get("aprGrad", "")
+        ))
+    return items
+
+
+def build_new(rows: list[dict]) -> List[CarItem]:
+    link_prefix = f"{DETAIL_URL_PREFIX}/{SCHE_ID}/"
+    return car_list_adapter.validate_python([_build_row(item, SCHE_ID, link_prefix) for item in rows])
+
+
+_response_field = create_response_field(name="Response_preview", type_=List[CarItem])
+
+
+async def serialize_old(items: List[CarItem]) -> bytes:
+    content = await serialize_response(field=_response_field, response_content=items)
+    return JSONResponse(content).body
+
+
+async def serialize_new(items: List[CarItem]) -> bytes:
+    return car_list_adapter.dump_json(items)
+
+
+async def measure(rows: list[dict], build, serialize, repeat: int) -> tuple[float, float, int]:
+    build_times, dump_times = [], []
+    size = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        items = build(rows)
+        built = time.perf_counter()
+        body = await serialize(items)
+        dump_times.append(time.perf_counter() - built)
+        build_times.append(built - started)
+        size = len(body)
+    return statistics.median(build_times), statistics.median(dump_times), size
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    print(f"{args.rows} rows, median of {args.repeat}")
+    for name, build, serialize in (("old", build_old, serialize_old), ("new", build_new, serialize_new)):
+        build_s, dump_s, size = await measure(rows, build, serialize, args.repeat)
+        total = build_s + dump_s
+        print(
+            f"{name:<4} build {build_s * 1000:7.1f} ms  serialize {dump_s * 1000:7.1f} ms  "
+            f"total {total * 1000:7.1f} ms | {args.rows / total:10.0f} rows/s | {size / 1024:.0f} KB"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
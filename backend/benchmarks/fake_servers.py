@@ -0,0 +1,243 @@
+"""
+Локальные заглушки внешних API для бенчмарков.
+
+- SK Car Rental: список аукциона (страницами), ссылки на фото (car-img) и сами JPEG.
+- Telegram Bot API: sendMediaGroup, deleteMessages, deleteMessage, иногда отвечает 429 RetryAfter.
+
+Можно запустить отдельно и натравить на них приложение через .env
+(SK_BASE_URL / TELEGRAM_API_URL):
+    python -m benchmarks.fake_servers --sk-port 8901 --tg-port 8902
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from dataclasses import dataclass
+from io import BytesIO
+
+from aiohttp import web
+from PIL import Image
+
+LIST_PATH = "/skr/common/uscr-chnl-comm-bff/open/get/expt-pauc/car/list"
+IMG_API_PATH = "/skr/common/uscr-chnl-comm-bff/open/get/expt-pauc/car-img"
+IMG_HOST_PATH = "/skr/common/comm-img-srvr"
+
+
+@dataclass
+class FakeConfig:
+    cars: int = 200
+    photos_per_car: int = 10
+    # Задержки ответа, секунды
+    list_latency: float = 0.15
+    img_api_latency: float = 0.05
+    image_latency: float = 0.08
+    # Размер исходных JPEG (как приходят с аукциона)
+    image_width: int = 1920
+    image_height: int = 1440
+    # Телеграм: задержка sendMediaGroup на одно фото и доля ответов 429
+    tg_latency: float = 0.05
+    tg_photo_latency: float = 0.02
+    tg_retry_after_rate: float = 0.0
+    tg_retry_after: int = 1
+    seed: int = 1
+
+
+def make_jpeg(width: int, height: int, seed: int = 0) -> bytes:
+    """Шумная картинка, чтобы JPEG весил как настоящее фото, а не как заливка."""
+    random.seed(seed)
+    img = Image.effect_noise((max(1, width // 4), max(1, height // 4)), 64).convert("RGB").resize((width, height))
+    out = BytesIO()
+    img.save(out, format="JPEG", quality=90)
+    return out.getvalue()
+
+
+# --- SK Car Rental ---
+
+def make_sk_app(config: FakeConfig) -> web.Application:
+    # Несколько разных JPEG, чтобы дисковый кэш не схлопнул все в один файл по содержимому
+    samples = [make_jpeg(config.image_width, config.image_height, seed) for seed in range(4)]
+    cars = [
+        {
+            "uscrId": f"BENCH{i:06d}",
+            "paucXhbtNo": str(1000 + i),
+            "carNo": f"{i:02d}가{i:04d}",
+            "carEnNm": f"Bench Car {i}",
+            "carYtiw": str(2015 + i % 10),
+            "vino": f"VIN{i:014d}",
+            "trvlDist": 10000 + i * 37,
+            "aprGrad": "A",
+        }
+        for i in range(config.cars)
+    ]
+
+    async def car_list(request: web.Request) -> web.Response:
+        await asyncio.sleep(config.list_latency)
+        limit = int(request.query.get("limit", 100))
+        # Парсер передает в offset номер страницы, а не сдвиг
+        page = int(request.query.get("offset", 0))
+        chunk = cars[page * limit:(page + 1) * limit]
+        for car in chunk:
+            car["uscrPaucScheId"] = request.query.get("uscrPaucScheId", "")
+        return web.json_response({"result": 0, "code": 0, "body": {"total": len(cars), "list": chunk}})
+
+    async def car_img(request: web.Request) -> web.Response:
+        await asyncio.sleep(config.img_api_latency)
+        car_id = request.query.get("uscrId", "")
+        body = [{"fileUadr": f"/{car_id}/{n}.jpg"} for n in range(config.photos_per_car)]
+        return web.json_response({"result": 0, "code": 0, "body": body})
+
+    async def image(request: web.Request) -> web.Response:
+        await asyncio.sleep(config.image_latency)
+        n = int(request.match_info["n"])
+        return web.Response(body=samples[n % len(samples)], content_type="image/jpeg")
+
+    app = web.Application()
+    app.router.add_get(LIST_PATH, car_list)
+    app.router.add_get(IMG_API_PATH, car_img)
+    app.router.add_get(IMG_HOST_PATH + "/{car_id}/{n}.jpg", image)
+    return app
+
+
+# --- Telegram Bot API ---
+
+def make_telegram_app(config: FakeConfig) -> web.Application:
+    rng = random.Random(config.seed)
+    message_ids = itertools.count(1)
+    file_ids = itertools.count(1)
+    stats = {"send_media_group": 0, "retry_after": 0, "uploaded_bytes": 0, "deleted": 0}
+
+    def retry_after() -> web.Response:
+        stats["retry_after"] += 1
+        return web.json_response(
+            {
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {config.tg_retry_after}",
+                "parameters": {"retry_after": config.tg_retry_after},
+            },
+            status=429,
+        )
+
+    def chat(chat_id) -> dict:
+        chat_id = int(chat_id)
+        return {"id": chat_id, "type": "private" if chat_id > 0 else "supergroup", "title": "bench"}
+
+    async def send_media_group(request: web.Request) -> web.Response:
+        form = await request.post()
+        if config.tg_retry_after_rate and rng.random() < config.tg_retry_after_rate:
+            return retry_after()
+        media = json.loads(form["media"])
+        uploaded = 0
+        result = []
+        now = int(time.time())
+        for item in media:
+            ref = item["media"]
+            if ref.startswith("attach://"):
+                # Новая загрузка: байты пришли в multipart, выдаем свежий file_id
+                uploaded += len(form[ref[len("attach://"):]].file.read())
+                file_id = f"fake-file-{next(file_ids)}"
+            else:
+                file_id = ref
+            result.append({
+                "message_id": next(message_ids),
+                "date": now,
+                "chat": chat(form["chat_id"]),
+                "media_group_id": "bench",
+                "photo": [{"file_id": file_id, "file_unique_id": file_id, "width": 1600, "height": 1200}],
+            })
+        stats["send_media_group"] += 1
+        stats["uploaded_bytes"] += uploaded
+        await asyncio.sleep(config.tg_latency + config.tg_photo_latency * len(media))
+        return web.json_response({"ok": True, "result": result})
+
+    async def delete_messages(request: web.Request) -> web.Response:
+        form = await request.post()
+        if config.tg_retry_after_rate and rng.random() < config.tg_retry_after_rate:
+            return retry_after()
+        stats["deleted"] += len(json.loads(form["message_ids"]))
+        await asyncio.sleep(config.tg_latency)
+        return web.json_response({"ok": True, "result": True})
+
+    async def delete_message(request: web.Request) -> web.Response:
+        await request.post()
+        stats["deleted"] += 1
+        await asyncio.sleep(config.tg_latency)
+        return web.json_response({"ok": True, "result": True})
+
+    async def get_stats(request: web.Request) -> web.Response:
+        return web.json_response(stats)
+
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app.router.add_post("/bot{token}/sendMediaGroup", send_media_group)
+    app.router.add_post("/bot{token}/deleteMessages", delete_messages)
+    app.router.add_post("/bot{token}/deleteMessage", delete_message)
+    app.router.add_get("/stats", get_stats)
+    return app
+
+
+async def serve(config: FakeConfig, sk_port: int, tg_port: int, ready=None):
+    runners = []
+    for app, port in ((make_sk_app(config), sk_port), (make_telegram_app(config), tg_port)):
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", port).start()
+        runners.append(runner)
+    if ready is not None:
+        ready.set()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        for runner in runners:
+            await runner.cleanup()
+
+
+def run_in_process(config: FakeConfig, sk_port: int, tg_port: int, ready=None):
+    """Точка входа для multiprocessing: заглушки не делят CPU и память с замеряемым процессом."""
+    try:
+        asyncio.run(serve(config, sk_port, tg_port, ready))
+    except KeyboardInterrupt:
+        pass
+
+
+def add_config_args(parser: argparse.ArgumentParser):
+    defaults = FakeConfig()
+    parser.add_argument("--cars", type=int, default=defaults.cars)
+    parser.add_argument("--photos-per-car", type=int, default=defaults.photos_per_car)
+    parser.add_argument("--list-latency", type=float, default=defaults.list_latency)
+    parser.add_argument("--img-api-latency", type=float, default=defaults.img_api_latency)
+    parser.add_argument("--image-latency", type=float, default=defaults.image_latency)
+    parser.add_argument("--image-width", type=int, default=defaults.image_width)
+    parser.add_argument("--image-height", type=int, default=defaults.image_height)
+    parser.add_argument("--tg-latency", type=float, default=defaults.tg_latency)
+    parser.add_argument("--tg-photo-latency", type=float, default=defaults.tg_photo_latency)
+    parser.add_argument("--tg-retry-after-rate", type=float, default=defaults.tg_retry_after_rate,
+                        help="доля запросов к Телеграму, на которые отвечать 429")
+    parser.add_argument("--tg-retry-after", type=int, default=defaults.tg_retry_after)
+
+
+def config_from_args(args: argparse.Namespace) -> FakeConfig:
+    return FakeConfig(
+        cars=args.cars,
+        photos_per_car=args.photos_per_car,
+        list_latency=args.list_latency,
+        img_api_latency=args.img_api_latency,
+        image_latency=args.image_latency,
+        image_width=args.image_width,
+        image_height=args.image_height,
+        tg_latency=args.tg_latency,
+        tg_photo_latency=args.tg_photo_latency,
+        tg_retry_after_rate=args.tg_retry_after_rate,
+        tg_retry_after=args.tg_retry_after,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sk-port", type=int, default=8901)
+    parser.add_argument("--tg-port", type=int, default=8902)
+    add_config_args(parser)
+    args = parser.parse_args()
+    print(f"SK_BASE_URL=http://127.0.0.1:{args.sk_port}  TELEGRAM_API_URL=http://127.0.0.1:{args.tg_port}")
+    run_in_process(config_from_args(args), args.sk_port, args.tg_port)
@@ -0,0 +1,89 @@
+"""
+Время импорта приложения (python -X importtime) и проверка бюджета.
+
+Запуск из папки backend:
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --repeat 10 --budget-ms 1200 --top 15
+
+Каждый замер — отдельный процесс `python -X importtime -c "import app.main"`.
+Время модулей раскладывается по пакетам (сумма собственного времени модулей пакета).
+Код возврата 1, если медиана дольше бюджета или при импорте подгрузился пакет
+из --lazy: они должны грузиться только там, где нужны (aiogram — при создании бота,
+Pillow — в ресайзе), а не при каждом старте и перезагрузке uvicorn.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+TARGET = "app.main"
+LAZY = ("aiogram", "PIL", "httpx", "aiohttp")
+
+
+def measure_once(target: str) -> tuple[int, dict[str, int]]:
+    """(общее время в мкс, {пакет: собственное время модулей пакета в мкс})"""
+    env = dict(os.environ)
+    env.setdefault("ADMIN_PASSWORD", "bench")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    total = 0
+    packages: dict[str, int] = defaultdict(int)
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        packages[name.split(".")[0]] += int(self_us)
+        if name == target:
+            total = int(cumulative_us)
+    return total, packages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", default=TARGET)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=1500.0, help="предел для медианы, мс")
+    parser.add_argument("--lazy", default=",".join(LAZY), help="пакеты, которых не должно быть при импорте")
+    args = parser.parse_args()
+
+    # Первый прогон прогревает кэш .pyc и диска, в статистику не идет
+    measure_once(args.target)
+    totals = []
+    per_package: dict[str, list[int]] = defaultdict(list)
+    for _ in range(args.repeat):
+        total, packages = measure_once(args.target)
+        totals.append(total)
+        for name, self_us in packages.items():
+            per_package[name].append(self_us)
+
+    median_ms = statistics.median(totals) / 1000
+    print(f"import {args.target}: median {median_ms:.0f} ms, min {min(totals) / 1000:.0f} ms ({args.repeat} runs)")
+    print(f"{'package':<24} {'ms':>8}")
+    by_time = sorted(per_package.items(), key=lambda kv: statistics.median(kv[1]), reverse=True)
+    for name, values in by_time[:args.top]:
+        print(f"{name:<24} {statistics.median(values) / 1000:8.1f}")
+
+    failed = False
+    loaded = [name for name in args.lazy.split(",") if name and name in per_package]
+    if loaded:
+        print(f"FAIL: imported eagerly: {', '.join(loaded)}")
+        failed = True
+    if median_ms > args.budget_ms:
+        print(f"FAIL: {median_ms:.0f} ms is over the {args.budget_ms:.0f} ms budget")
+        failed = True
+    if not failed:
+        print(f"OK: within {args.budget_ms:.0f} ms budget, no eager imports of {args.lazy}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
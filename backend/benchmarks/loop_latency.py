@@ -0,0 +1,91 @@
+"""
+Замер задержки event loop во время ресайза фото.
+
+Запуск из папки backend:
+    python -m benchmarks.loop_latency --photos 20 --workers 2
+
+Сравнивает ресайз прямо в корутине (как было) и через пул (как сейчас).
+Пока идет ресайз, отдельная задача тикает каждые 10 мс и меряет,
+на сколько опоздал каждый тик — это и есть задержка для /api/logs и прочих запросов.
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from io import BytesIO
+
+os.environ.setdefault("ADMIN_PASSWORD", "bench")
+
+from PIL import Image  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.services import images  # noqa: E402
+
+TICK = 0.01
+
+
+def make_sample_jpeg(width: int = 4000, height: int = 3000) -> bytes:
+    """Синтетическое "фото с аукциона": шум, чтобы JPEG не сжимался в ноль."""
+    img = Image.effect_noise((width // 4, height // 4), 64).convert("RGB").resize((width, height))
+    out = BytesIO()
+    img.save(out, format="JPEG", quality=92)
+    return out.getvalue()
+
+
+async def _ticker(lags: list, stop: asyncio.Event):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(TICK)
+        lags.append(loop.time() - start - TICK)
+
+
+async def _inline_resize(data: bytes) -> bytes:
+    # Старое поведение: Pillow прямо в корутине
+    return images.resize_image(data)
+
+
+async def run_case(name: str, resize, samples: list) -> None:
+    lags: list = []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(_ticker(lags, stop))
+    started = time.perf_counter()
+    # Как в process_batch: один альбом = gather по фото
+    await asyncio.gather(*(resize(data) for data in samples))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await ticker
+
+    lags.sort()
+    p50 = lags[len(lags) // 2] if lags else 0.0
+    p99 = lags[int(len(lags) * 0.99)] if lags else 0.0
+    worst = lags[-1] if lags else 0.0
+    print(
+        f"{name:<10} total {elapsed * 1000:8.0f} ms | loop lag p50 {p50 * 1000:6.1f} ms"
+        f" p99 {p99 * 1000:6.1f} ms max {worst * 1000:6.1f} ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--photos", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=settings.IMAGE_WORKERS)
+    parser.add_argument("--executor", choices=["thread", "process"], default=settings.IMAGE_EXECUTOR)
+    args = parser.parse_args()
+
+    settings.IMAGE_WORKERS = args.workers
+    settings.IMAGE_EXECUTOR = args.executor
+
+    random.seed(1)
+    sample = make_sample_jpeg()
+    samples = [sample] * args.photos
+    print(f"{args.photos} photos of {len(sample) // 1024} KB, executor={args.executor} x{args.workers}")
+
+    await run_case("inline", _inline_resize, samples)
+    await run_case("executor", images.resize_image_async, samples)
+    images.shutdown_image_executor()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
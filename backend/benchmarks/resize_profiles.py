@@ -0,0 +1,72 @@
+"""
+Микробенчмарк ресайза: мс на фото и размер результата для каждого профиля.
+
+Запуск из папки backend:
+    python -m benchmarks.resize_profiles
+    python -m benchmarks.resize_profiles --images ~/auction_samples --repeat 5
+
+Без --images берет синтетические фото: большое с аукциона, среднее
+и маленькое, которое уже влезает в Телеграм (для него работает pass-through).
+"""
+import argparse
+import os
+import statistics
+import time
+from pathlib import Path
+
+os.environ.setdefault("ADMIN_PASSWORD", "bench")
+
+from benchmarks.fake_servers import make_jpeg  # noqa: E402
+from app.services import images  # noqa: E402
+
+
+def synthetic_samples() -> list[tuple[str, bytes]]:
+    return [
+        ("4000x3000", make_jpeg(4000, 3000, seed=1)),
+        ("1920x1440", make_jpeg(1920, 1440, seed=2)),
+        ("1280x960", make_jpeg(1280, 960, seed=3)),
+    ]
+
+
+def load_samples(folder: str) -> list[tuple[str, bytes]]:
+    paths = sorted(p for p in Path(folder).expanduser().iterdir() if p.suffix.lower() in (".jpg", ".jpeg", ".png"))
+    return [(p.name, p.read_bytes()) for p in paths]
+
+
+def measure(data: bytes, profile: images.ResizeProfile, repeat: int) -> tuple[float, int]:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = images.resize_image(data, profile)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), len(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", help="папка с настоящими фото (jpg/png)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    samples = load_samples(args.images) if args.images else synthetic_samples()
+    if not samples:
+        raise SystemExit("no images found")
+
+    print(f"{'image':<24} {'input':>9} " + " ".join(f"{name:>22}" for name in images.PROFILES))
+    totals = {name: [0.0, 0] for name in images.PROFILES}
+    for label, data in samples:
+        cells = []
+        for name, profile in images.PROFILES.items():
+            seconds, size = measure(data, profile, args.repeat)
+            totals[name][0] += seconds
+            totals[name][1] += size
+            cells.append(f"{seconds * 1000:8.1f} ms {size / 1024:7.0f} KB")
+        print(f"{label[:24]:<24} {len(data) / 1024:6.0f} KB " + " ".join(f"{cell:>22}" for cell in cells))
+
+    count = len(samples)
+    cells = [f"{t * 1000 / count:8.1f} ms {s / 1024 / count:7.0f} KB" for t, s in totals.values()]
+    print(f"{'average':<24} {'':>9} " + " ".join(f"{cell:>22}" for cell in cells))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Сквозной замер пропускной способности без интернета.
+
+Поднимает заглушки SK Car Rental и Telegram Bot API (benchmarks/fake_servers.py)
+в отдельном процессе и гонит через них настоящий код приложения:
+fetch_auction_list -> process_batch -> delete_messages_bulk.
+
+Запуск из папки backend:
+    python -m benchmarks.throughput --cars 100 --destinations 2
+    python -m benchmarks.throughput --tg-retry-after-rate 0.05 --real-limits
+
+По умолчанию лимиты Телеграма подняты, чтобы мерить сам конвейер, а не паузы лимитера.
+База, дисковый кэш и прочее пишутся во временную папку, рабочая history.db не трогается.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import resource
+import socket
+import sys
+import tempfile
+import time
+
+from benchmarks.fake_servers import add_config_args, config_from_args, run_in_process
+
+AUCTION_ID = "BENCH"
+BATCH_ID = "bench"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss в Linux — килобайты
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def configure_env(args, sk_port: int, tg_port: int, workdir: str):
+    """Настройки приложения читаются при импорте, поэтому env задаем до него."""
+    os.environ["ADMIN_PASSWORD"] = "bench"
+    os.environ["BOT_TOKEN"] = "123456:BENCH"
+    os.environ["SK_BASE_URL"] = f"http://127.0.0.1:{sk_port}"
+    os.environ["TELEGRAM_API_URL"] = f"http://127.0.0.1:{tg_port}"
+    os.environ["IMAGE_CACHE_DIR"] = os.path.join(workdir, "image_cache")
+    # Заглушки слушают обычный HTTP/1.1
+    os.environ["HTTP2"] = "false"
+    if not args.real_limits:
+        os.environ["TG_GLOBAL_RATE"] = "10000"
+        os.environ["TG_PRIVATE_CHAT_RATE"] = "10000"
+        os.environ["TG_GROUP_RATE_PER_MIN"] = "600000"
+        os.environ["TG_CHAT_BURST"] = "100"
+    # Локальные заглушки не должны уходить через прокси окружения
+    os.environ["NO_PROXY"] = "127.0.0.1,localhost"
+    os.environ["no_proxy"] = "127.0.0.1,localhost"
+
+
+async def collect_events(queue: asyncio.Queue, prepare_ms: list, send_ms: list):
+    while True:
+        message = str(await queue.get())
+        event, data = message.split("\n", 2)[:2]
+        if event != "event: car":
+            continue
+        payload = json.loads(data[len("data: "):])
+        if payload.get("stage") == "prepared":
+            prepare_ms.append(payload["ms"])
+        elif payload.get("stage") == "sent":
+            send_ms.append(payload["ms"])
+
+
+async def run(args, tg_port: int):
+    import httpx
+
+    from app.database import init_db, close_db, get_messages_by_batch, delete_message_records
+    from app.models import CarRequestItem, Destination
+    from app.services.cleanup import delete_messages_bulk
+    from app.services.events import events
+    from app.services.http import init_http_client, close_http_client
+    from app.services.images import shutdown_image_executor
+    from app.services.logger import logger
+    from app.services.parser import fetch_auction_list
+    from app.services.processing import process_batch
+    from app.services.ratelimit import telegram_limiter
+    from app.services.telegram import get_bot, close_bot
+
+    await init_db()
+    await init_http_client()
+
+    # Большая очередь подписчика: бенчмарку нужны все события, а не последние 256
+    events.queue_size = 1_000_000
+    queue = events.subscribe()
+    prepare_ms: list = []
+    send_ms: list = []
+    collector = asyncio.create_task(collect_events(queue, prepare_ms, send_ms))
+
+    try:
+        started = time.perf_counter()
+        cars = await fetch_auction_list(AUCTION_ID)
+        list_seconds = time.perf_counter() - started
+
+        items = [CarRequestItem(id=car.uscrId, caption=f"{car.paucXhbtNo} {car.carEnNm}") for car in cars]
+        destinations = [
+            Destination(chat_id=-1000000000000 - i, name=f"bench-{i}") for i in range(args.destinations)
+        ]
+
+        started = time.perf_counter()
+        status = await process_batch(items, destinations, BATCH_ID)
+        batch_seconds = time.perf_counter() - started
+
+        messages = await get_messages_by_batch(BATCH_ID)
+        started = time.perf_counter()
+        removed = await delete_messages_bulk(get_bot(), messages, BATCH_ID)
+        await delete_message_records(removed)
+        cleanup_seconds = time.perf_counter() - started
+
+    finally:
+        collector.cancel()
+        events.unsubscribe(queue)
+        await close_bot()
+        await close_http_client()
+        shutdown_image_executor()
+        await close_db()
+
+    async with httpx.AsyncClient(trust_env=False) as client:
+        tg_stats = (await client.get(f"http://127.0.0.1:{tg_port}/stats")).json()
+
+    logger.flush()
+    albums = len(items) * len(destinations)
+    print()
+    print(f"cars {len(items)} x destinations {len(destinations)} = {albums} albums, status={status}")
+    print(f"auction list     {list_seconds * 1000:8.0f} ms")
+    print(
+        f"process_batch    {batch_seconds:8.2f} s  | {len(items) / batch_seconds * 60:8.1f} cars/min"
+        f"  {albums / batch_seconds * 60:8.1f} albums/min"
+    )
+    print(f"prepare per car  p50 {percentile(prepare_ms, 0.5):6.0f} ms  p95 {percentile(prepare_ms, 0.95):6.0f} ms")
+    print(f"send per album   p50 {percentile(send_ms, 0.5):6.0f} ms  p95 {percentile(send_ms, 0.95):6.0f} ms")
+    print(f"cleanup          {cleanup_seconds * 1000:8.0f} ms  | {len(removed)}/{len(messages)} messages deleted")
+    print(
+        f"telegram         {tg_stats['send_media_group']} sendMediaGroup, "
+        f"{tg_stats['uploaded_bytes'] / 1024 / 1024:.1f} MB uploaded, "
+        f"{tg_stats['retry_after']} x 429 (limiter saw {telegram_limiter.retry_after_hits})"
+    )
+    print(f"peak RSS         {peak_rss_mb():8.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_config_args(parser)
+    parser.add_argument("--destinations", type=int, default=1)
+    parser.add_argument("--real-limits", action="store_true", help="лимиты Телеграма из настроек, а не поднятые")
+    args = parser.parse_args()
+
+    sk_port, tg_port = free_port(), free_port()
+    ready = multiprocessing.Event()
+    fakes = multiprocessing.Process(
+        target=run_in_process, args=(config_from_args(args), sk_port, tg_port, ready), daemon=True
+    )
+    fakes.start()
+    if not ready.wait(30):
+        fakes.terminate()
+        sys.exit("fake servers did not start")
+
+    workdir = tempfile.mkdtemp(prefix="sk-bench-")
+    configure_env(args, sk_port, tg_port, workdir)
+    # history.db лежит в текущей папке — уходим во временную
+    os.chdir(workdir)
+    try:
+        asyncio.run(run(args, tg_port))
+    finally:
+        fakes.terminate()
+        fakes.join()
+
+
+if __name__ == "__main__":
+    main()
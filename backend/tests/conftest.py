@@ -0,0 +1,7 @@
+import os
+import sys
+from pathlib import Path
+
+# Настройки читаются при импорте app.config, пароль там обязательный
+os.environ.setdefault("ADMIN_PASSWORD", "test")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
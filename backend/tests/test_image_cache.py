@@ -0,0 +1,56 @@
+"""Дисковый кэш фото, общий для нескольких воркеров (два экземпляра на одной папке)."""
+import asyncio
+import os
+import time
+
+from app.services.image_cache import DiskImageCache
+
+
+def make_caches(directory, max_bytes: int, rescan_interval: float = 60.0):
+    caches = [DiskImageCache(str(directory), max_bytes) for _ in range(2)]
+    for cache in caches:
+        cache.RESCAN_INTERVAL = rescan_interval
+    return caches
+
+
+def test_sees_files_written_by_another_worker(tmp_path):
+    a, b = make_caches(tmp_path, 10_000)
+
+    async def run():
+        assert await b.get("k1") is None  # b уже загрузил индекс, файла еще нет
+        await a.put("k1", b"x" * 100)
+        return await b.get("k1")
+
+    assert asyncio.run(run()) == b"x" * 100
+    assert b.stats()["size"] == 1 and b.stats()["bytes"] == 100
+
+
+def test_cap_applies_to_the_whole_directory(tmp_path):
+    a, b = make_caches(tmp_path, 1_000, rescan_interval=0)
+
+    async def run():
+        for i in range(8):
+            await (a if i % 2 else b).put(f"k{i}", b"x" * 200)
+            # Разное mtime: LRU по времени использования
+            await asyncio.sleep(0.01)
+
+    asyncio.run(run())
+    files = {name: os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(tmp_path) for name in names}
+    assert sum(files.values()) <= 1_000
+    assert "k7.jpg" in files and "k0.jpg" not in files
+
+
+def test_scan_keeps_fresh_temp_files(tmp_path):
+    cache = DiskImageCache(str(tmp_path), 10_000)
+    folder = tmp_path / "ab"
+    folder.mkdir()
+    fresh = folder / "fresh.tmp"
+    stale = folder / "stale.tmp"
+    fresh.write_bytes(b"partial")
+    stale.write_bytes(b"partial")
+    old = time.time() - cache.TMP_MAX_AGE - 1
+    os.utime(stale, (old, old))
+
+    asyncio.run(cache.get("missing"))
+
+    assert fresh.exists() and not stale.exists()
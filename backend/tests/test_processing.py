@@ -0,0 +1,70 @@
+"""Конвейер партии без сети и базы: Телеграм и подготовка фото подменены."""
+import asyncio
+from types import SimpleNamespace
+
+from app.models import CarRequestItem, Destination
+from app.services import processing
+
+
+async def _noop(*args, **kwargs):
+    pass
+
+
+def fake_pipeline(monkeypatch):
+    """Подготовка отдает одно фото с file_id, отправка — одно сообщение."""
+    sent = []
+
+    async def prepare_car(http_client, item, index, total, batch_id=""):
+        return [processing.PreparedPhoto(f"https://photo/{item.id}", file_id=f"file-{item.id}")]
+
+    async def send_with_retry(bot, chat_id, media, thread_id=None):
+        sent.append((chat_id, media[0].media))
+        return [SimpleNamespace(message_id=len(sent), photo=[SimpleNamespace(file_id=media[0].media)])]
+
+    for name in ("start_batch", "finish_batch", "flush_db", "save_message_ids", "save_file_ids"):
+        monkeypatch.setattr(processing, name, _noop)
+    monkeypatch.setattr(processing, "get_bot", lambda: None)
+    monkeypatch.setattr(processing, "get_http_client", lambda: None)
+    monkeypatch.setattr(processing, "prepare_car", prepare_car)
+    monkeypatch.setattr(processing, "send_with_retry", send_with_retry)
+    return sent
+
+
+def make_items(count: int):
+    return [CarRequestItem(id=str(i), caption=f"car {i}") for i in range(1, count + 1)]
+
+
+def test_checkpoint_errors_do_not_stall_the_batch(monkeypatch):
+    sent = fake_pipeline(monkeypatch)
+    failures = []
+
+    async def on_result(car_index: int, dest_index: int, result: str):
+        failures.append((car_index, dest_index))
+        raise RuntimeError("database is locked")
+
+    async def run():
+        return await asyncio.wait_for(
+            processing.process_batch(
+                make_items(10), [Destination(chat_id=1, name="Admin")], "b1", on_result=on_result
+            ),
+            timeout=10
+        )
+
+    assert asyncio.run(run()) == "done"
+    assert len(sent) == 10
+    assert failures == [(i, 0) for i in range(1, 11)]
+
+
+def test_results_are_reported_per_destination(monkeypatch):
+    sent = fake_pipeline(monkeypatch)
+    results = []
+
+    async def on_result(car_index: int, dest_index: int, result: str):
+        results.append((car_index, dest_index, result))
+
+    destinations = [Destination(chat_id=1, name="Admin"), Destination(chat_id=-100, name="Group")]
+    status = asyncio.run(processing.process_batch(make_items(3), destinations, "b2", on_result=on_result))
+
+    assert status == "done"
+    assert len(sent) == 6
+    assert sorted(results) == [(i, d, "done") for i in range(1, 4) for d in range(2)]
@@ -0,0 +1,184 @@
+"""Лимитер Телеграма на поддельных часах: никаких реальных пауз."""
+import asyncio
+
+import pytest
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMediaGroup
+
+from app.services.ratelimit import DECREASE_FACTOR, RECOVERY_STEP, TelegramRateLimiter, TokenBucket
+
+
+class FakeClock:
+    """Часы и sleep, которые двигают время мгновенно."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps: list[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def make_limiter(clock: FakeClock, **kwargs) -> TelegramRateLimiter:
+    params = dict(global_rate=30.0, private_rate=1.0, group_rate=20 / 60, burst=1.0, delete_rate=10.0)
+    params.update(kwargs)
+    return TelegramRateLimiter(**params, clock=clock, sleep=clock.sleep)
+
+
+async def ok():
+    return True
+
+
+def test_reserve_serves_waiters_in_order():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2.0, capacity=2.0, clock=clock)
+    # Два токена есть сразу, дальше каждая следующая резервация ждет на 1/rate дольше
+    waits = [bucket.reserve() for _ in range(5)]
+    assert waits == pytest.approx([0.0, 0.0, 0.5, 1.0, 1.5])
+
+
+def test_bucket_refills_over_time():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1.0, capacity=3.0, clock=clock)
+    for _ in range(3):
+        bucket.reserve()
+    clock.now += 2.0
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(1.0)
+
+
+def test_private_chat_limit():
+    clock = FakeClock()
+    limiter = make_limiter(clock)
+
+    async def run():
+        for _ in range(3):
+            await limiter.call(42, ok)
+
+    asyncio.run(run())
+    # 1 сообщение в секунду в личный чат
+    assert clock.now == pytest.approx(2.0)
+
+
+def test_group_limit_is_stricter():
+    clock = FakeClock()
+    limiter = make_limiter(clock)
+
+    async def run():
+        for _ in range(3):
+            await limiter.call(-100123, ok)
+
+    asyncio.run(run())
+    # 20 в минуту -> по 3 секунды
+    assert clock.now == pytest.approx(6.0)
+
+
+def test_global_limit_across_chats():
+    clock = FakeClock()
+    limiter = make_limiter(clock, global_rate=2.0, private_rate=100.0, burst=100.0)
+
+    async def run():
+        for chat_id in range(1, 7):
+            await limiter.call(chat_id, ok)
+
+    asyncio.run(run())
+    # Разные чаты, но на бота 2 в секунду: 2 сразу, остальные 4 — за 2 секунды
+    assert clock.now == pytest.approx(2.0)
+
+
+def test_chats_do_not_share_chat_buckets():
+    clock = FakeClock()
+    limiter = make_limiter(clock)
+
+    async def run():
+        for chat_id in (1, 2, 3):
+            await limiter.call(chat_id, ok)
+
+    asyncio.run(run())
+    assert clock.now == 0.0
+
+
+def test_deletes_use_own_bucket():
+    clock = FakeClock()
+    limiter = make_limiter(clock)
+
+    async def run():
+        for _ in range(20):
+            await limiter.call(-100123, ok, kind="delete")
+        # Очистка не съела бакет отправки этого же канала
+        started = clock.now
+        await limiter.call(-100123, ok)
+        return clock.now - started
+
+    send_wait = asyncio.run(run())
+    # 10 удалений сразу (емкость), остальные 10 — по 0.1 секунды
+    assert clock.now == pytest.approx(1.0)
+    assert send_wait == 0.0
+
+
+def test_penalize_blocks_and_halves_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=10.0, capacity=10.0, clock=clock)
+    bucket.penalize(5.0)
+    assert bucket.rate == pytest.approx(10.0 * DECREASE_FACTOR)
+    assert bucket.reserve() == pytest.approx(5.0)
+    clock.now += 5.0
+    # Пауза прошла — запросы снова идут, но скорость остается урезанной до reward
+    assert bucket.reserve() == 0.0
+    assert bucket.rate == pytest.approx(10.0 * DECREASE_FACTOR)
+
+
+def test_reward_recovers_gradually():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=10.0, capacity=10.0, clock=clock)
+    bucket.penalize(1.0)
+    rates = []
+    for _ in range(20):
+        bucket.reward()
+        rates.append(bucket.rate)
+    step = 10.0 * RECOVERY_STEP
+    assert rates[0] == pytest.approx(5.0 + step)
+    assert rates == sorted(rates)
+    # Не выше базовой скорости
+    assert rates[-1] == pytest.approx(10.0)
+    assert max(rates) <= 10.0
+
+
+def test_retry_after_waits_and_retries():
+    clock = FakeClock()
+    limiter = make_limiter(clock, private_rate=10.0, burst=10.0)
+    attempts = 0
+
+    async def flaky():
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise TelegramRetryAfter(
+                method=SendMediaGroup(chat_id=42, media=[]), message="Flood control exceeded", retry_after=7
+            )
+        return "sent"
+
+    result = asyncio.run(limiter.call(42, flaky))
+    assert result == "sent"
+    assert attempts == 2
+    assert limiter.retry_after_hits == 1
+    assert clock.now >= 7.0
+
+
+def test_retry_after_gives_up_after_max_attempts():
+    clock = FakeClock()
+    limiter = make_limiter(clock, max_retry_after=2)
+
+    async def always_flood():
+        raise TelegramRetryAfter(
+            method=SendMediaGroup(chat_id=42, media=[]), message="Flood control exceeded", retry_after=1
+        )
+
+    with pytest.raises(TelegramRetryAfter):
+        asyncio.run(limiter.call(42, always_flood))
+    assert limiter.retry_after_hits == 2
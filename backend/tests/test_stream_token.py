@@ -0,0 +1,48 @@
+"""Короткий токен для /api/events: пароль в ?token= больше не принимается."""
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+from app.config import settings
+from app.routers import api
+
+
+def verify(token=None, credentials=None):
+    return asyncio.run(api.verify_stream_token(token=token, credentials=credentials))
+
+
+def test_issued_token_is_accepted():
+    token = api.issue_stream_token()
+    assert verify(token=token) == token
+
+
+def test_password_in_query_is_rejected():
+    with pytest.raises(HTTPException):
+        verify(token=settings.ADMIN_PASSWORD)
+
+
+def test_password_in_header_still_works():
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=settings.ADMIN_PASSWORD)
+    assert verify(credentials=credentials) == settings.ADMIN_PASSWORD
+
+
+def test_expired_token_is_rejected(monkeypatch):
+    token = api.issue_stream_token()
+    now = api.time.time()
+    monkeypatch.setattr(api.time, "time", lambda: now + settings.STREAM_TOKEN_TTL + 1)
+    with pytest.raises(HTTPException):
+        verify(token=token)
+
+
+@pytest.mark.parametrize("token", ["", "garbage", "123.abc", "9999999999.deadbeef", "²²²²²²²²²².abc", "１２３４５６７８９０.abc"])
+def test_forged_token_is_rejected(token):
+    with pytest.raises(HTTPException):
+        verify(token=token)
+
+
+def test_tampered_expiry_is_rejected():
+    expires, signature = api.issue_stream_token().split(".")
+    with pytest.raises(HTTPException):
+        verify(token=f"{int(expires) + 3600}.{signature}")
@@ -0,0 +1,101 @@
+"""Автослежение на временной history.db: два воркера не ставят одни и те же машины дважды."""
+import asyncio
+
+import pytest
+
+from app import database
+from app.models import AuctionList, CarItem, Destination
+from app.services import watcher as watcher_module
+from app.services.watcher import AuctionWatcher, snapshot_hash
+
+
+def make_car(car_id: str, mileage: int = 1000) -> CarItem:
+    return CarItem(
+        uscrId=car_id, uscrPaucScheId="A1", paucXhbtNo=car_id, carNo="", carEnNm="Car", carYtiw="2020",
+        vino="", link="", trvlDist=mileage, grade="A"
+    )
+
+
+@pytest.fixture
+def history_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_NAME", str(tmp_path / "history.db"))
+    monkeypatch.setattr(database, "_db", None)
+
+
+@pytest.fixture
+def submitted(monkeypatch):
+    """Очередь задач подменена: постановка медленная, как запись в занятую базу."""
+    jobs = []
+
+    async def submit(items, destinations, job_id):
+        await asyncio.sleep(0.05)
+        jobs.append([item.id for item in items])
+        return True
+
+    monkeypatch.setattr(watcher_module.job_queue, "submit", submit)
+    return jobs
+
+
+def serve_cars(monkeypatch, cars):
+    async def fetch_auction_list(sche_id):
+        await asyncio.sleep(0)
+        return AuctionList(cars)
+
+    monkeypatch.setattr(watcher_module, "fetch_auction_list", fetch_auction_list)
+
+
+def test_lease_is_exclusive_until_released_or_expired(history_db):
+    async def run():
+        await database.init_db()
+        try:
+            assert await database.try_acquire_lease("watcher", "w1", 60)
+            assert await database.try_acquire_lease("watcher", "w1", 60)  # Продление своей
+            assert not await database.try_acquire_lease("watcher", "w2", 60)
+            await database.release_lease("watcher", "w2")  # Чужую не отпускает
+            assert not await database.try_acquire_lease("watcher", "w2", 60)
+            await database.release_lease("watcher", "w1")
+            assert await database.try_acquire_lease("watcher", "w2", -1)
+            assert await database.try_acquire_lease("watcher", "w1", 60)  # Истекла
+        finally:
+            await database.close_db()
+
+    asyncio.run(run())
+
+
+def test_concurrent_checks_submit_changes_once(history_db, submitted, monkeypatch):
+    serve_cars(monkeypatch, [make_car("1"), make_car("2"), make_car("3")])
+    destinations = [Destination(chat_id=1, name="Admin")]
+
+    async def run():
+        await database.init_db()
+        try:
+            await database.save_auction_snapshot(
+                "A1", [(car.uscrId, snapshot_hash(car), 1000, "A", "2020") for car in (make_car("1"), make_car("2"))], []
+            )
+            workers = [AuctionWatcher(60, owner="w1"), AuctionWatcher(60, owner="w2")]
+            return await asyncio.gather(*(w.check_auction("A1", destinations) for w in workers))
+        finally:
+            await database.close_db()
+
+    results = asyncio.run(run())
+    assert submitted == [["3"]]
+    assert sorted(result.get("error") or "ok" for result in results) == ["busy", "ok"]
+
+
+def test_sequential_checks_do_not_repost(history_db, submitted, monkeypatch):
+    serve_cars(monkeypatch, [make_car("1"), make_car("2", mileage=5000)])
+    destinations = [Destination(chat_id=1, name="Admin")]
+
+    async def run():
+        await database.init_db()
+        try:
+            await database.save_auction_snapshot("A1", [("1", snapshot_hash(make_car("1")), 1000, "A", "2020")], [])
+            first = await AuctionWatcher(60, owner="w1").check_auction("A1", destinations)
+            second = await AuctionWatcher(60, owner="w2").check_auction("A1", destinations)
+            return first, second
+        finally:
+            await database.close_db()
+
+    first, second = asyncio.run(run())
+    assert submitted == [["2"]]
+    assert first["new"] == 1 and second["new"] == 0 and second["job_id"] is None
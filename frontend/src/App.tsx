@@ -6,6 +6,9 @@ import { CarTable } from './components/CarTable';
 import { HistoryPanel } from './components/HistoryPanel';
 import { Search, Send, Loader2, Lock, Filter, X, LayoutList, Activity } from 'lucide-react'; // Новые иконки
 
+// Сколько строк лога держать в терминале
+const MAX_LOG_LINES = 100;
+
 function App() {
   // --- STATE ---
   const [token, setToken] = useState<string | null>(localStorage.getItem('sk_token'));
@@ -43,8 +46,38 @@ function App() {
     if (token) {
       loadDestinations();
       fetchHistory();
-      const interval = setInterval(fetchLogs, 3000);
-      return () => clearInterval(interval);
+      // Стартовый снимок лога, дальше строки приходят потоком (SSE) без опроса
+      fetchLogs();
+      // Пароль в адрес не кладем (осядет в логах nginx и истории): берем короткий токен.
+      // Браузер сам переподключается, но после истечения токена получит 401 и закроет
+      // поток — тогда открываем заново со свежим токеном
+      let source: EventSource | null = null;
+      let retryTimer: number | undefined;
+      let closed = false;
+      const connect = async () => {
+        let streamToken: string;
+        try {
+          streamToken = (await api.post('/events/token')).data.token;
+        } catch (e) {
+          if (!closed) retryTimer = window.setTimeout(connect, 5000);
+          return;
+        }
+        if (closed) return;
+        const es = new EventSource(`/api/events?token=${encodeURIComponent(streamToken)}`);
+        es.addEventListener('log', (e) => {
+          const { text } = JSON.parse((e as MessageEvent).data);
+          setLogs(prev => [...prev.slice(-(MAX_LOG_LINES - 1)), text]);
+        });
+        es.addEventListener('batch', (e) => {
+          if (JSON.parse((e as MessageEvent).data).stage === 'finished') fetchHistory();
+        });
+        es.onerror = () => {
+          if (es.readyState === EventSource.CLOSED && !closed) retryTimer = window.setTimeout(connect, 3000);
+        };
+        source = es;
+      };
+      connect();
+      return () => { closed = true; window.clearTimeout(retryTimer); source?.close(); };
     }
   }, [token]);
 
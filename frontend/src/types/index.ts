@@ -25,13 +25,22 @@ export interface ProcessItem {
   caption: string;
 }
 
+export interface ProcessDestination {
+  chat_id: number;
+  message_thread_id?: number;
+  name: string;
+}
+
 // ОБНОВЛЕНО: payload для отправки
 export interface ProcessRequest {
   items: ProcessItem[];
-  target_chat_id: number;
   batch_id: string;
+  // Один получатель
+  target_chat_id?: number;
   message_thread_id?: number;
-  destination_name: string; // <-- НОВОЕ (Обязательное)
+  destination_name?: string;
+  // Или сразу несколько (фото готовятся один раз)
+  destinations?: ProcessDestination[];
 }
 
 // ОБНОВЛЕНО: элемент истории
@@ -40,4 +49,5 @@ export interface BatchHistoryItem {
   created_at: string;
   count: number;
   destination_name: string; // <-- НОВОЕ (Приходит с бэка)
+  status?: 'running' | 'done' | 'failed';
 }
\ No newline at end of file